@@ -1,5 +1,23 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from .models import FormTemplate, StudentSubmission
+from .tasks import requeue_submissions
 
-admin.site.register(FormTemplate)
-admin.site.register(StudentSubmission)
\ No newline at end of file
+
+@admin.register(FormTemplate)
+class FormTemplateAdmin(admin.ModelAdmin):
+    list_display = ('title', 'slug', 'admin', 'background_type', 'created_at')
+    actions = ['reprocess_photos']
+
+    @admin.action(description='Reprocess photos with the current background')
+    def reprocess_photos(self, request, queryset):
+        queued = 0
+        for form_template in queryset:
+            stale = form_template.submissions.exclude(original_photo='').exclude(
+                processed_background=form_template.background_signature(),
+                processing_status=StudentSubmission.STATUS_DONE,
+            )
+            queued += requeue_submissions(stale)
+        self.message_user(request, f'{queued} photo(s) queued for reprocessing.', messages.SUCCESS)
+
+
+admin.site.register(StudentSubmission)
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'core'
\ No newline at end of file
+    name = 'core'
+
+    def ready(self):
+        from . import signals  # Connects the model signal handlers
+        from .checks import check_static_manifest
+        checks.register(check_static_manifest)
@@ -0,0 +1,215 @@
+import re
+from pathlib import Path
+
+from django.conf import settings
+
+# The public form's stylesheet holds only the Tailwind utilities these files use, so the page loads no CDN.
+# After changing a class in one of them, run `python manage.py build_css`.
+PUBLIC_SOURCES = [
+    'core/templates/public_form/student_form.html',
+    'core/templates/public_form/success.html',
+    'core/static/js/main.js',
+]
+PUBLIC_CSS_PATH = 'core/static/css/public_form.css'
+# Classes styled by the pages' own <style> blocks rather than by utilities
+PAGE_CLASSES = {'spinner'}
+
+# Tailwind's default palette, for the colors the forms use
+PALETTE = {
+    'gray': ['f9fafb', 'f3f4f6', 'e5e7eb', 'd1d5db', '9ca3af', '6b7280', '4b5563', '374151', '1f2937', '111827'],
+    'red': ['fef2f2', 'fee2e2', 'fecaca', 'fca5a5', 'f87171', 'ef4444', 'dc2626', 'b91c1c', '991b1b', '7f1d1d'],
+    'green': ['f0fdf4', 'dcfce7', 'bbf7d0', '86efac', '4ade80', '22c55e', '16a34a', '15803d', '166534', '14532d'],
+    'teal': ['f0fdfa', 'ccfbf1', '99f6e4', '5eead4', '2dd4bf', '14b8a6', '0d9488', '0f766e', '115e59', '134e4a'],
+    'indigo': ['eef2ff', 'e0e7ff', 'c7d2fe', 'a5b4fc', '818cf8', '6366f1', '4f46e5', '4338ca', '3730a3', '312e81'],
+}
+SHADES = ['50', '100', '200', '300', '400', '500', '600', '700', '800', '900']
+
+FONT_SIZES = {
+    'xs': ('0.75rem', '1rem'), 'sm': ('0.875rem', '1.25rem'), 'base': ('1rem', '1.5rem'), 'lg': ('1.125rem', '1.75rem'),
+    'xl': ('1.25rem', '1.75rem'), '2xl': ('1.5rem', '2rem'), '3xl': ('1.875rem', '2.25rem'), '4xl': ('2.25rem', '2.5rem'),
+}
+FONT_WEIGHTS = {'normal': 400, 'medium': 500, 'semibold': 600, 'bold': 700}
+RADII = {'': '0.25rem', 'md': '0.375rem', 'lg': '0.5rem', 'xl': '0.75rem', '2xl': '1rem', 'full': '9999px'}
+MAX_WIDTHS = {'sm': '24rem', 'md': '28rem', 'lg': '32rem', 'xl': '36rem', '2xl': '42rem', '3xl': '48rem', '4xl': '56rem'}
+SHADOWS = {
+    '': '0 1px 3px 0 rgb(0 0 0 / 0.1), 0 1px 2px -1px rgb(0 0 0 / 0.1)',
+    'md': '0 4px 6px -1px rgb(0 0 0 / 0.1), 0 2px 4px -2px rgb(0 0 0 / 0.1)',
+    'lg': '0 10px 15px -3px rgb(0 0 0 / 0.1), 0 4px 6px -4px rgb(0 0 0 / 0.1)',
+    'xl': '0 20px 25px -5px rgb(0 0 0 / 0.1), 0 8px 10px -6px rgb(0 0 0 / 0.1)',
+}
+
+STATIC_UTILITIES = {
+    'block': 'display:block', 'hidden': 'display:none', 'flex': 'display:flex', 'inline-flex': 'display:inline-flex',
+    'fixed': 'position:fixed', 'relative': 'position:relative', 'absolute': 'position:absolute',
+    'flex-col': 'flex-direction:column', 'items-center': 'align-items:center', 'justify-center': 'justify-content:center',
+    'overflow-hidden': 'overflow:hidden', 'object-cover': 'object-fit:cover',
+    'mx-auto': 'margin-left:auto;margin-right:auto', 'w-full': 'width:100%', 'w-auto': 'width:auto',
+    'h-full': 'height:100%', 'min-h-screen': 'min-height:100vh',
+    'text-left': 'text-align:left', 'text-center': 'text-align:center', 'cursor-pointer': 'cursor:pointer',
+    'border': 'border-width:1px', 'border-0': 'border-width:0px', 'border-2': 'border-width:2px',
+    'border-t': 'border-top-width:1px', 'border-b': 'border-bottom-width:1px',
+    'transition': 'transition-property:color,background-color,border-color,text-decoration-color,fill,stroke,opacity,'
+                  'box-shadow,transform,filter,backdrop-filter;transition-timing-function:cubic-bezier(0.4,0,0.2,1);'
+                  'transition-duration:150ms',
+}
+
+# Variant prefix -> (pseudo-element, pseudo-class)
+VARIANTS = {
+    'hover': ('', ':hover'),
+    'focus': ('', ':focus'),
+    'disabled': ('', ':disabled'),
+    'file': ('::file-selector-button', ''),
+    'has-[:checked]': ('', ':has(:checked)'),
+}
+
+# Subset of Tailwind's preflight: the browser defaults it resets are what the utilities assume
+PREFLIGHT = """\
+*,::before,::after{box-sizing:border-box;border-width:0;border-style:solid;border-color:#e5e7eb;\
+--tw-ring-color:rgb(99 102 241 / 0.5)}
+html{line-height:1.5;-webkit-text-size-adjust:100%;tab-size:4;font-family:ui-sans-serif,system-ui,-apple-system,\
+"Segoe UI",Roboto,"Helvetica Neue",Arial,"Noto Sans",sans-serif,"Apple Color Emoji","Segoe UI Emoji"}
+body{margin:0;line-height:inherit}
+h1,h2,h3,h4,h5,h6{font-size:inherit;font-weight:inherit}
+h1,h2,h3,h4,h5,h6,p{margin:0}
+button,input,select,textarea{font-family:inherit;font-size:100%;font-weight:inherit;line-height:inherit;color:inherit;\
+margin:0;padding:0}
+button,select{text-transform:none}
+button,[type=button],[type=submit]{-webkit-appearance:button;background-color:transparent;background-image:none}
+button,[role=button]{cursor:pointer}
+:disabled{cursor:default}
+textarea{resize:vertical}
+img,svg,video,canvas{display:block;vertical-align:middle}
+img,video{max-width:100%;height:auto}
+[hidden]{display:none}
+"""
+
+_SPACING_PREFIXES = {
+    'p': ['padding'], 'px': ['padding-left', 'padding-right'], 'py': ['padding-top', 'padding-bottom'],
+    'pt': ['padding-top'], 'pr': ['padding-right'], 'pb': ['padding-bottom'], 'pl': ['padding-left'],
+    'm': ['margin'], 'mx': ['margin-left', 'margin-right'], 'my': ['margin-top', 'margin-bottom'],
+    'mt': ['margin-top'], 'mr': ['margin-right'], 'mb': ['margin-bottom'], 'ml': ['margin-left'],
+    'w': ['width'], 'h': ['height'], 'max-h': ['max-height'], 'min-h': ['min-height'], 'inset': ['inset'],
+}
+_COLOR_PROPERTIES = {'bg': 'background-color', 'text': 'color', 'border': 'border-color'}
+_CLASS_ATTRIBUTE = re.compile(r'class="([^"]*)"')
+_CLASS_LIST_CALL = re.compile(r'classList\.(?:add|remove|toggle|replace)\(([^)]*)\)')
+_STRING_LITERAL = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+_VARIANT_SEPARATOR = re.compile(r':(?![^\[]*\])')  # Colons outside arbitrary values like has-[:checked]
+_TEMPLATE_SYNTAX = re.compile(r'{%.*?%}|{{.*?}}|\$\{.*?\}')
+
+
+def spacing(value):
+    """Tailwind's spacing scale: n means n quarter-rems."""
+    if value == 'px':
+        return '1px'
+    if value == '0':
+        return '0px'
+    if re.fullmatch(r'\d+(\.5)?', value):
+        return f'{float(value) / 4:g}rem'
+    return None
+
+
+def color(name):
+    if name == 'black':
+        return '0 0 0'
+    if name == 'white':
+        return '255 255 255'
+    hue, _, shade = name.rpartition('-')
+    if hue in PALETTE and shade in SHADES:
+        value = PALETTE[hue][SHADES.index(shade)]
+        return ' '.join(str(int(value[i:i + 2], 16)) for i in (0, 2, 4))
+    return None
+
+
+def utility(name):
+    """(selector suffix, declarations) for a utility class without variants, or None if it isn't supported."""
+    if name in STATIC_UTILITIES:
+        return '', STATIC_UTILITIES[name]
+
+    prefix, _, value = name.rpartition('-')
+    if prefix in _SPACING_PREFIXES and spacing(value):
+        return '', ';'.join(f'{prop}:{spacing(value)}' for prop in _SPACING_PREFIXES[prefix])
+    if prefix in ('space-x', 'space-y') and spacing(value):
+        side = 'left' if prefix == 'space-x' else 'top'
+        return ' > :not([hidden]) ~ :not([hidden])', f'margin-{side}:{spacing(value)}'
+    if prefix == 'max-w' and value in MAX_WIDTHS:
+        return '', f'max-width:{MAX_WIDTHS[value]}'
+    if name.startswith('text-') and name[5:] in FONT_SIZES:
+        size, line_height = FONT_SIZES[name[5:]]
+        return '', f'font-size:{size};line-height:{line_height}'
+    if name.startswith('font-') and name[5:] in FONT_WEIGHTS:
+        return '', f'font-weight:{FONT_WEIGHTS[name[5:]]}'
+    if name == 'rounded' or name.startswith('rounded-') and name[8:] in RADII:
+        return '', f'border-radius:{RADII[name[8:]]}'
+    if name == 'shadow' or name.startswith('shadow-') and name[7:] in SHADOWS:
+        return '', f'--tw-shadow:{SHADOWS[name[7:]]};box-shadow:var(--tw-ring-shadow,0 0 #0000),var(--tw-shadow)'
+
+    kind, _, rest = name.partition('-')
+    if kind in _COLOR_PROPERTIES and color(rest):
+        return '', f'--tw-{kind}-opacity:1;{_COLOR_PROPERTIES[kind]}:rgb({color(rest)} / var(--tw-{kind}-opacity))'
+    if kind == 'ring' and color(rest):
+        return '', f'--tw-ring-color:rgb({color(rest)} / 1)'
+    if kind == 'ring' and rest.isdigit():
+        return '', (f'--tw-ring-shadow:0 0 0 {rest}px var(--tw-ring-color);'
+                    'box-shadow:var(--tw-ring-shadow),var(--tw-shadow,0 0 #0000)')
+    if kind in ('bg', 'text', 'border') and rest.startswith('opacity-') and rest[8:].isdigit():
+        return '', f'--tw-{kind}-opacity:{int(rest[8:]) / 100:g}'
+    if kind == 'z' and rest.isdigit():
+        return '', f'z-index:{rest}'
+    if kind == 'duration' and rest.isdigit():
+        return '', f'transition-duration:{rest}ms'
+    return None
+
+
+def escape(class_name):
+    return re.sub(r'([^a-zA-Z0-9_-])', r'\\\1', class_name)
+
+
+def rule(class_name):
+    """The CSS rule for a class with any variant prefixes (hover:, focus:, file:, has-[:checked]:), or None."""
+    *variants, name = _VARIANT_SEPARATOR.split(class_name)
+    if any(variant not in VARIANTS for variant in variants):
+        return None
+    resolved = utility(name)
+    if resolved is None:
+        return None
+    suffix, declarations = resolved
+    pseudo_element = ''.join(VARIANTS[variant][0] for variant in variants)
+    pseudo_classes = ''.join(VARIANTS[variant][1] for variant in variants)
+    return f'.{escape(class_name)}{pseudo_element}{pseudo_classes}{suffix}{{{declarations}}}'
+
+
+def collect_classes(paths):
+    """
+    Class names in the class attributes of templates and of markup built in scripts, and those scripts pass to
+    classList; template tags are skipped.
+    """
+    classes = set()
+    for path in paths:
+        text = Path(path).read_text(encoding='utf-8')
+        for attribute in _CLASS_ATTRIBUTE.findall(text):
+            classes.update(_TEMPLATE_SYNTAX.sub(' ', attribute).split())
+        for arguments in _CLASS_LIST_CALL.findall(text):
+            classes.update(single or double for single, double in _STRING_LITERAL.findall(arguments))
+    return classes
+
+
+def build_css(classes):
+    """
+    Returns (stylesheet, unsupported class names). As in Tailwind, opacity modifiers follow the colors they adjust
+    and variant rules come after plain ones so they win.
+    """
+    rules, unsupported = [], []
+    for class_name in sorted(classes - PAGE_CLASSES, key=lambda c: (c.count(':'), '-opacity-' in c, c)):
+        css = rule(class_name)
+        if css is None:
+            unsupported.append(class_name)
+        else:
+            rules.append(css)
+    header = f'/* Generated by `python manage.py build_css` from {", ".join(PUBLIC_SOURCES)}; do not edit. */\n'
+    return header + PREFLIGHT + '\n'.join(rules) + '\n', unsupported
+
+
+def build_public_css():
+    base = Path(settings.BASE_DIR)
+    return build_css(collect_classes(base / path for path in PUBLIC_SOURCES))
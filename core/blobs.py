@@ -0,0 +1,66 @@
+import os
+import hashlib
+import logging
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+from .derivatives import content_digest
+
+logger = logging.getLogger(__name__)
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """Streams each uploaded file to a temporary file and computes its SHA-256 on the way, for store_blob."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        uploaded_file.sha256 = self.digest.hexdigest()
+        return uploaded_file
+
+
+def blob_name(prefix, digest, original_name):
+    """Content-addressed storage path; the original extension is kept so files still open with the right type."""
+    extension = os.path.splitext(original_name)[1].lower()
+    return f'{prefix}/{digest[:2]}/{digest}{extension}'
+
+
+def touch_blob(name):
+    """
+    Marks a stored blob as just used and returns whether it exists. gc_media spares files modified within
+    --min-age, so an upload deduplicated onto an orphaned blob keeps it alive until its row is saved.
+    """
+    try:
+        os.utime(default_storage.path(name))
+    except NotImplementedError:
+        return default_storage.exists(name)  # Storage without local paths; gc_media only scans MEDIA_ROOT
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def store_blob(uploaded_file, prefix):
+    """
+    Stores an upload under the SHA-256 of its contents, writing it only if that content isn't stored yet.
+    Uploads parsed with HashingFileUploadHandler arrive already hashed; anything else is hashed from its chunks.
+    Returns (storage name, digest).
+    """
+    digest = getattr(uploaded_file, 'sha256', None) or content_digest(uploaded_file)
+    name = blob_name(prefix, digest, uploaded_file.name)
+    if not touch_blob(name):
+        uploaded_file.seek(0)
+        saved_name = default_storage.save(name, uploaded_file)
+        if saved_name != name:
+            # Another request stored the same content in the meantime; keep a single copy
+            default_storage.delete(saved_name)
+            logger.info("Discarded concurrent duplicate of blob %s", name)
+    uploaded_file.seek(0)
+    return name, digest
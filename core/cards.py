@@ -0,0 +1,324 @@
+import io
+import json
+import logging
+import tempfile
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import django
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .derivatives import ensure_derivative
+from .models import StudentSubmission
+
+logger = logging.getLogger(__name__)
+
+# CR80 (standard ID card) in portrait, and the sheets cards can be laid out on. All sizes in millimetres.
+CARD_SIZE_MM = (53.98, 85.6)
+SHEET_SIZES_MM = {
+    'A4': (210, 297),
+    'A3': (297, 420),
+    'card': CARD_SIZE_MM,  # One card per page, e.g. for card printers
+}
+SHEET_MARGIN_MM = 8
+CARD_GAP_MM = 4
+
+# Keys a FormTemplate.card_layout may set; missing keys fall back to these
+DEFAULT_CARD_LAYOUT = {
+    'fields': None,  # Names from form_fields; defaults to the first four non-file fields
+    'accent_color': '#4F46E5',
+    'text_color': '#111827',
+    'dpi': 300,
+}
+
+
+def card_layout(form_template):
+    layout = {**DEFAULT_CARD_LAYOUT, **(form_template.card_layout or {})}
+    if not layout['fields']:
+        layout['fields'] = [f['name'] for f in form_template.form_fields if f.get('type') != 'file'][:4]
+    return layout
+
+
+@lru_cache(maxsize=32)
+def load_font(size, bold=False):
+    """TrueType font at a pixel size, loaded once per process. Set CARD_FONT_PATH to use a specific font."""
+    candidates = [settings.CARD_FONT_PATH] if settings.CARD_FONT_PATH else []
+    candidates.append('DejaVuSans-Bold.ttf' if bold else 'DejaVuSans.ttf')
+    for path in candidates:
+        try:
+            return ImageFont.truetype(path, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+
+def fit_text(draw, text, font, width):
+    """Shortens text with an ellipsis until it fits in width pixels."""
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + '…', font=font) > width:
+        text = text[:-1]
+    return text + '…'
+
+
+def field_text(value):
+    if isinstance(value, list):
+        return ', '.join(str(v) for v in value)
+    return '' if value is None else str(value)
+
+
+class CardRenderer:
+    """
+    Renders the ID cards of one form. Everything shared by its cards (fonts, the decoded logo, the header with
+    title) is drawn once onto a base image, so each card only adds the photo and the student's fields.
+    """
+
+    def __init__(self, form_template):
+        layout = card_layout(form_template)
+        self.dpi = layout['dpi']
+        self.fields = layout['fields']
+        self.text_color = layout['text_color']
+        self.size = (self.mm(CARD_SIZE_MM[0]), self.mm(CARD_SIZE_MM[1]))
+        self.header_height = self.mm(15)
+        self.photo_box = (self.mm(9.5), self.header_height + self.mm(3), self.mm(9.5 + 35), self.header_height + self.mm(3 + 45))
+        self.name_font = load_font(self.mm(3.4), bold=True)
+        self.label_font = load_font(self.mm(2.2))
+        self.value_font = load_font(self.mm(2.6), bold=True)
+        self.base = self._draw_base(form_template, layout['accent_color'])
+
+    def mm(self, value):
+        return round(value * self.dpi / 25.4)
+
+    def _draw_base(self, form_template, accent_color):
+        card = Image.new('RGB', self.size, '#FFFFFF')
+        draw = ImageDraw.Draw(card)
+        draw.rectangle([0, 0, self.size[0], self.header_height], fill=accent_color)
+        padding = self.mm(2)
+        text_left = padding
+
+        if form_template.client_logo:
+            try:
+                with default_storage.open(form_template.client_logo.name, 'rb') as f:
+                    logo = ImageOps.exif_transpose(Image.open(f)).convert('RGBA')
+                side = self.header_height - 2 * padding
+                logo.thumbnail((side, side), Image.LANCZOS)
+                card.paste(logo, (padding, (self.header_height - logo.height) // 2), logo)
+                text_left = padding * 2 + logo.width
+            except Exception as e:
+                logger.warning("Could not load logo of form %s: %s", form_template.id, e)
+
+        title_font = load_font(self.mm(3), bold=True)
+        title = fit_text(draw, form_template.title, title_font, self.size[0] - text_left - padding)
+        draw.text((text_left, self.header_height // 2), title, font=title_font, fill='#FFFFFF', anchor='lm')
+        return card
+
+    def _paste_photo(self, card, submission):
+        left, top, right, bottom = self.photo_box
+        photo = None
+        if submission.processed_photo:
+            try:
+                with default_storage.open(ensure_derivative(submission, 'card_print'), 'rb') as f:
+                    photo = Image.open(f).convert('RGB')
+            except Exception as e:
+                logger.warning("Could not load photo of submission %s: %s", submission.id, e)
+        if photo is None:
+            draw = ImageDraw.Draw(card)
+            draw.rectangle(self.photo_box, fill='#E5E7EB')
+            draw.text(((left + right) // 2, (top + bottom) // 2), 'No photo', font=self.label_font, fill='#6B7280', anchor='mm')
+            return
+        card.paste(ImageOps.fit(photo, (right - left, bottom - top), Image.LANCZOS), (left, top))
+
+    def render(self, submission):
+        card = self.base.copy()
+        self._paste_photo(card, submission)
+
+        draw = ImageDraw.Draw(card)
+        padding = self.mm(3)
+        width = self.size[0] - 2 * padding
+        y = self.photo_box[3] + self.mm(2.5)
+        for index, name in enumerate(self.fields):
+            value = field_text(submission.data.get(name))
+            if index == 0:
+                draw.text((self.size[0] // 2, y), fit_text(draw, value, self.name_font, width), font=self.name_font,
+                          fill=self.text_color, anchor='mt')
+                y += self.mm(5)
+                continue
+            if y + self.mm(3.5) > self.size[1]:
+                break
+            label = f'{name}: '
+            draw.text((padding, y), label, font=self.label_font, fill='#6B7280')
+            label_width = draw.textlength(label, font=self.label_font)
+            draw.text((padding + label_width, y - self.mm(0.3)), fit_text(draw, value, self.value_font, width - label_width),
+                      font=self.value_font, fill=self.text_color)
+            y += self.mm(3.8)
+        return card
+
+
+_renderers = {}
+
+
+def get_renderer(form_template):
+    """Per-process CardRenderer, rebuilt when anything drawn on the base card changes."""
+    key = (form_template.id, form_template.title, form_template.client_logo.name or '',
+           json.dumps(card_layout(form_template), sort_keys=True))
+    renderer = _renderers.get(key)
+    if renderer is None:
+        if len(_renderers) >= 8:
+            _renderers.clear()
+        renderer = _renderers[key] = CardRenderer(form_template)
+    return renderer
+
+
+def sheet_grid(sheet, dpi):
+    """Card positions (in pixels) on a sheet, centred, as many as fit."""
+    sheet_w, sheet_h = SHEET_SIZES_MM[sheet]
+    if sheet == 'card':
+        return [(0, 0)]
+    card_w, card_h = CARD_SIZE_MM
+    columns = int((sheet_w - 2 * SHEET_MARGIN_MM + CARD_GAP_MM) // (card_w + CARD_GAP_MM))
+    rows = int((sheet_h - 2 * SHEET_MARGIN_MM + CARD_GAP_MM) // (card_h + CARD_GAP_MM))
+    left = (sheet_w - columns * card_w - (columns - 1) * CARD_GAP_MM) / 2
+    top = (sheet_h - rows * card_h - (rows - 1) * CARD_GAP_MM) / 2
+    to_px = lambda value: round(value * dpi / 25.4)
+    return [
+        (to_px(left + column * (card_w + CARD_GAP_MM)), to_px(top + row * (card_h + CARD_GAP_MM)))
+        for row in range(rows) for column in range(columns)
+    ]
+
+
+def render_page(form_template, submissions, sheet):
+    """Renders one page of cards and returns (JPEG bytes, page size in mm)."""
+    renderer = get_renderer(form_template)
+    sheet_w, sheet_h = SHEET_SIZES_MM[sheet]
+    page = Image.new('RGB', (renderer.mm(sheet_w), renderer.mm(sheet_h)), '#FFFFFF')
+    draw = ImageDraw.Draw(page)
+    for (x, y), submission in zip(sheet_grid(sheet, renderer.dpi), submissions):
+        page.paste(renderer.render(submission), (x, y))
+        if sheet != 'card':
+            # Hairline cutting guide
+            draw.rectangle([x - 1, y - 1, x + renderer.size[0], y + renderer.size[1]], outline='#D1D5DB')
+    buffer = io.BytesIO()
+    page.save(buffer, format='JPEG', quality=92, dpi=(renderer.dpi, renderer.dpi))
+    return buffer.getvalue(), (sheet_w, sheet_h)
+
+
+def _render_page_by_ids(submission_ids, sheet):
+    submissions = list(StudentSubmission.objects.select_related('form_template').filter(id__in=submission_ids).order_by('id'))
+    if not submissions:
+        return None
+    return render_page(submissions[0].form_template, submissions, sheet)
+
+
+def render_pages(submission_ids, sheet='A4', workers=1):
+    """
+    Yields the rendered pages for the given submissions in order. With several workers pages are rendered in
+    a process pool, keeping at most two pages per worker in flight so memory stays bounded however many cards there are.
+    The pool's processes start from a forkserver and set Django up afresh: forking the worker, whose other threads may
+    hold ONNX, PIL or logging locks, could leave a child deadlocked on a lock nobody will release.
+    """
+    submission_ids = list(submission_ids)
+    per_page = len(sheet_grid(sheet, DEFAULT_CARD_LAYOUT['dpi']))
+    groups = [submission_ids[i:i + per_page] for i in range(0, len(submission_ids), per_page)]
+
+    if workers <= 1:
+        for group in groups:
+            page = _render_page_by_ids(group, sheet)
+            if page is not None:
+                yield page
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver'),
+                             initializer=django.setup) as pool:
+        in_flight = deque()
+        for group in groups:
+            in_flight.append(pool.submit(_render_page_by_ids, group, sheet))
+            if len(in_flight) >= workers * 2:
+                page = in_flight.popleft().result()
+                if page is not None:
+                    yield page
+        while in_flight:
+            page = in_flight.popleft().result()
+            if page is not None:
+                yield page
+
+
+# --- Streaming PDF writer ---
+
+def _points(mm):
+    return mm * 72 / 25.4
+
+
+def stream_pdf(pages):
+    """
+    Writes a PDF whose pages are each a single full-page JPEG (embedded as-is with DCTDecode), yielding it
+    page by page so no more than one page is ever held in memory.
+    """
+    offsets = {}
+    position = 0
+    page_refs = []
+
+    def write_object(number, body):
+        nonlocal position
+        offsets[number] = position
+        data = f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+        position += len(data)
+        return data
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position += len(header)
+    yield header
+    yield write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+
+    number = 3
+    for jpeg, (width_mm, height_mm) in pages:
+        with Image.open(io.BytesIO(jpeg)) as image:
+            width_px, height_px = image.size
+        width_pt, height_pt = _points(width_mm), _points(height_mm)
+        image_ref, contents_ref, page_ref = number, number + 1, number + 2
+        number += 3
+
+        chunk = write_object(image_ref, (
+            f'<< /Type /XObject /Subtype /Image /Width {width_px} /Height {height_px} /ColorSpace /DeviceRGB '
+            f'/BitsPerComponent 8 /Filter /DCTDecode /Length {len(jpeg)} >>\nstream\n'
+        ).encode() + jpeg + b'\nendstream')
+        contents = f'q {width_pt:.2f} 0 0 {height_pt:.2f} 0 0 cm /Im0 Do Q'.encode()
+        chunk += write_object(contents_ref, f'<< /Length {len(contents)} >>\nstream\n'.encode() + contents + b'\nendstream')
+        chunk += write_object(page_ref, (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width_pt:.2f} {height_pt:.2f}] '
+            f'/Resources << /XObject << /Im0 {image_ref} 0 R >> >> /Contents {contents_ref} 0 R >>'
+        ).encode())
+        page_refs.append(page_ref)
+        yield chunk
+
+    kids = ' '.join(f'{ref} 0 R' for ref in page_refs)
+    trailer = write_object(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(page_refs)} >>'.encode())
+    xref_position = position
+    trailer += f'xref\n0 {number}\n0000000000 65535 f \n'.encode()
+    trailer += b''.join(f'{offsets[n]:010d} 00000 n \n'.encode() for n in range(1, number))
+    trailer += f'trailer\n<< /Size {number} /Root 1 0 R >>\nstartxref\n{xref_position}\n%%EOF\n'.encode()
+    yield trailer
+
+
+# --- Background exports ---
+
+def card_render_workers():
+    """Processes to render an export with: Celery's prefork children are daemonic and can't start a pool of their own."""
+    if multiprocessing.current_process().daemon:
+        return 1
+    return max(1, settings.CARD_RENDER_WORKERS)
+
+
+def build_card_export(export, workers=None):
+    """Renders every card of the export's form into a PDF, spooled to a temporary file and then stored on the export."""
+    submission_ids = list(export.form_template.submissions.order_by('id').values_list('id', flat=True))
+    with tempfile.TemporaryFile() as f:
+        for chunk in stream_pdf(render_pages(submission_ids, export.sheet, workers or card_render_workers())):
+            f.write(chunk)
+        f.seek(0)
+        export.file.save(f'{export.form_template.slug}_cards_{export.sheet}.pdf', File(f), save=False)
+    export.cards = len(submission_ids)
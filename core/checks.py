@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestFilesMixin, staticfiles_storage
+from django.core.checks import Warning
+
+
+def check_static_manifest(app_configs, **kwargs):
+    """
+    With DEBUG off, the manifest storage resolves every {% static %} from the manifest collectstatic writes, so
+    without it each page fails with a 500. Warns before that happens instead of on the first request.
+    """
+    if settings.DEBUG or not isinstance(staticfiles_storage, ManifestFilesMixin):
+        return []
+    if staticfiles_storage.manifest_storage.exists(staticfiles_storage.manifest_name):
+        return []
+    return [Warning(
+        f'No static files manifest in {settings.STATIC_ROOT}; with DEBUG=False every page will fail to render.',
+        hint='Run `python manage.py collectstatic --noinput` after each deploy, before starting the server.',
+        id='core.W001',
+    )]
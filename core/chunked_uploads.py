@@ -0,0 +1,170 @@
+import os
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from .blobs import store_blob
+from .derivatives import content_digest
+from .models import ChunkedUpload
+
+logger = logging.getLogger(__name__)
+
+PARTIAL_UPLOAD_DIR = 'partial_uploads'
+_READ_SIZE = 64 * 1024
+
+
+class UploadError(ValueError):
+    """Raised when a chunk or completion request doesn't fit the upload's state; carries the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def partial_path(upload):
+    """Where chunks are assembled: a plain file appended in place, so no chunk is ever kept in memory."""
+    return os.path.join(settings.MEDIA_ROOT, PARTIAL_UPLOAD_DIR, str(upload.upload_id))
+
+
+def upload_state(upload):
+    return {
+        'upload_id': str(upload.upload_id),
+        'offset': upload.offset,
+        'size': upload.size,
+        'complete': bool(upload.stored_name),
+        'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+    }
+
+
+def start_upload(form_template, field, filename, size, sha256=''):
+    if field != 'photo' and field not in {f['name'] for f in form_template.form_fields if f.get('type') == 'file'}:
+        raise UploadError('Unknown file field.')
+    if not 0 < size <= settings.MAX_EXTRA_UPLOAD_SIZE:
+        raise UploadError(f'File is too large (max {settings.MAX_EXTRA_UPLOAD_SIZE // (1024 * 1024)} MB).', status=413)
+    upload = ChunkedUpload.objects.create(
+        form_template=form_template, field=field, filename=os.path.basename(filename)[:255], size=size, sha256=sha256.lower(),
+    )
+    path = partial_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    return upload
+
+
+def append_chunk(upload, offset, stream, length, sha256=''):
+    """
+    Writes a chunk read from stream at offset. A chunk whose offset isn't the upload's current offset is
+    refused with 409 so the client can resume from the offset we report; a chunk failing its checksum is discarded.
+    """
+    if upload.stored_name:
+        raise UploadError('The upload is already complete.', status=409)
+    if offset != upload.offset:
+        raise UploadError('Chunk does not start at the current offset.', status=409)
+    if length <= 0 or offset + length > upload.size:
+        raise UploadError('Chunk exceeds the declared size.')
+
+    digest = hashlib.sha256()
+    written = 0
+    with open(partial_path(upload), 'r+b') as f:
+        f.seek(offset)
+        while written < length:
+            data = stream.read(min(_READ_SIZE, length - written))
+            if not data:
+                break
+            digest.update(data)
+            f.write(data)
+            written += len(data)
+        if written != length or (sha256 and digest.hexdigest() != sha256.lower()):
+            f.truncate(offset)
+            raise UploadError('Chunk was incomplete or failed its checksum.')
+        f.truncate(offset + written)
+
+    # Conditional on the offset so two concurrent copies of the same chunk can't both advance it
+    if not ChunkedUpload.objects.filter(id=upload.id, offset=offset).update(offset=offset + written):
+        upload.refresh_from_db()
+        raise UploadError('Chunk does not start at the current offset.', status=409)
+    upload.offset = offset + written
+    return upload
+
+
+def complete_upload(upload):
+    """Checks the assembled file and moves it into content-addressed storage, where the submission will find it."""
+    if upload.stored_name:
+        return upload
+    if upload.offset != upload.size:
+        raise UploadError('The upload is missing data.', status=409)
+
+    path = partial_path(upload)
+    with open(path, 'rb') as f:
+        assembled = File(f, name=upload.filename)
+        assembled.sha256 = content_digest(assembled)
+        if upload.sha256 and assembled.sha256 != upload.sha256:
+            raise UploadError('The file failed its checksum; upload it again.')
+        prefix = 'original_photos' if upload.field == 'photo' else 'extra_uploads'
+        upload.stored_name, _ = store_blob(assembled, prefix)
+    upload.sha256 = assembled.sha256
+    upload.save(update_fields=['stored_name', 'sha256'])
+    os.remove(path)
+    return upload
+
+
+def completed_uploads(form_template, post, files):
+    """
+    Completed chunked uploads a submission references by upload id in the POST, keyed by field name,
+    for the file fields that weren't posted directly.
+    """
+    file_fields = {'photo'} | {f['name'] for f in form_template.form_fields if f.get('type') == 'file'}
+    completed = {}
+    for name in file_fields - set(files):
+        upload_id = post.get(name)
+        if not upload_id:
+            continue
+        try:
+            upload = ChunkedUpload.objects.get(upload_id=upload_id, form_template=form_template, field=name)
+        except (ChunkedUpload.DoesNotExist, ValueError, ValidationError):
+            continue
+        if upload.stored_name:
+            completed[name] = upload
+    return completed
+
+
+def open_uploads(files, completed):
+    """
+    Files of a submission: those posted directly plus the stored files of its completed uploads. Those are
+    already stored, so store_blob finds them in place; close them with close_uploads() once the submission is stored.
+    """
+    opened = MultiValueDict({name: files.getlist(name) for name in files})
+    for name, upload in completed.items():
+        stored = default_storage.open(upload.stored_name, 'rb')
+        stored.sha256 = upload.sha256
+        opened[name] = stored
+    return opened
+
+
+def close_uploads(files, completed):
+    for name in completed:
+        if name in files:
+            files[name].close()
+
+
+def expired_uploads():
+    return ChunkedUpload.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD_EXPIRY))
+
+
+def discard_expired_uploads():
+    """Deletes expired upload records and their partial files; returns how many were removed."""
+    removed = 0
+    for upload in expired_uploads().iterator():
+        try:
+            os.remove(partial_path(upload))
+        except FileNotFoundError:
+            pass
+        upload.delete()
+        removed += 1
+    return removed
@@ -0,0 +1,81 @@
+import io
+import hashlib
+import logging
+
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+# Named renditions of a processed photo. Sizes are in pixels; card_print is 35x45 mm at 300 DPI.
+RENDITIONS = {
+    'thumb': {'size': (112, 112), 'format': 'JPEG', 'extension': 'jpg', 'content_type': 'image/jpeg', 'options': {'quality': 80}},
+    'preview': {'size': (320, 320), 'format': 'WEBP', 'extension': 'webp', 'content_type': 'image/webp', 'options': {'quality': 80}},
+    'card_print': {'size': (413, 531), 'format': 'JPEG', 'extension': 'jpg', 'content_type': 'image/jpeg', 'options': {'quality': 95, 'dpi': (300, 300)}},
+}
+
+
+def content_digest(file):
+    """SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def photo_digest(submission):
+    """Digest of the submission's processed photo, computed and stored on first use for older rows."""
+    if not submission.processed_photo_digest:
+        with submission.processed_photo.open('rb') as photo:
+            submission.processed_photo_digest = content_digest(photo)
+        submission.save(update_fields=['processed_photo_digest'])
+    return submission.processed_photo_digest
+
+
+def derivative_name(digest, rendition):
+    """Content-addressed storage path: identical source photos share their renditions."""
+    spec = RENDITIONS[rendition]
+    return f"derivatives/{digest[:2]}/{digest}_{rendition}.{spec['extension']}"
+
+
+def derivative_url(submission, rendition):
+    """URL of a rendition, versioned by the photo's digest so browsers can cache it forever."""
+    url = reverse('submission_photo', args=[submission.id, rendition])
+    if submission.processed_photo_digest:
+        url += f'?v={submission.processed_photo_digest}'
+    return url
+
+
+def render(image, rendition):
+    spec = RENDITIONS[rendition]
+    image = ImageOps.fit(image.convert('RGB'), spec['size'], Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format=spec['format'], **spec['options'])
+    return buffer.getvalue()
+
+
+def ensure_derivative(submission, rendition, image=None):
+    """
+    Returns the storage name of a rendition of the submission's processed photo, generating it if needed.
+    Pass the already-decoded processed image to avoid reading it back from storage.
+    """
+    name = derivative_name(photo_digest(submission), rendition)
+    if not default_storage.exists(name):
+        if image is None:
+            with submission.processed_photo.open('rb') as photo:
+                image = Image.open(photo)
+                image.load()
+        default_storage.save(name, ContentFile(render(image, rendition)))
+    return name
+
+
+def pregenerate_derivatives(submission, image):
+    """Generates the renditions in DERIVATIVES_PREGENERATE right after a photo is processed."""
+    for rendition in settings.DERIVATIVES_PREGENERATE:
+        try:
+            ensure_derivative(submission, rendition, image)
+        except Exception as e:
+            logger.warning("Could not generate %s for submission %s: %s", rendition, submission.id, e)
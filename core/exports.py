@@ -0,0 +1,126 @@
+import csv
+import logging
+import tempfile
+import zipfile
+
+from openpyxl import Workbook
+
+logger = logging.getLogger(__name__)
+
+ZIP_READ_CHUNK_SIZE = 64 * 1024
+# Submissions fetched per round trip, and CSV rows sent per response chunk
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _ZipStreamBuffer:
+    """
+    Write-only file object for zipfile. It has no seek(), so zipfile streams entries with data
+    descriptors, and whatever has been written since the last call is collected with pop().
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def photo_archive_name(submission):
+    name = (submission.data.get('Full Name') or 'student').replace(' ', '_')
+    roll_no = submission.data.get('Roll Number') or submission.id
+    return f"{roll_no}-{name}.jpg"
+
+
+def stream_photos_zip(submissions):
+    """
+    Yields a zip archive of the submissions' processed photos piece by piece, so memory use stays
+    constant however many photos there are. JPEGs are already compressed, so entries are STORED.
+    Photos missing from storage are listed in a MISSING_FILES.txt entry at the end of the archive.
+    """
+    buffer = _ZipStreamBuffer()
+    missing = []
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as zip_file:
+        for submission in submissions:
+            filename = photo_archive_name(submission)
+            try:
+                with submission.processed_photo.open('rb') as photo, zip_file.open(filename, 'w') as entry:
+                    while chunk := photo.read(ZIP_READ_CHUNK_SIZE):
+                        entry.write(chunk)
+                        yield buffer.pop()
+            except OSError as e:
+                logger.warning("Could not add %s to zip: %s", submission.processed_photo.name, e)
+                missing.append(f"{filename}\t{submission.processed_photo.name}\t{e}")
+            yield buffer.pop()
+
+        if missing:
+            zip_file.writestr('MISSING_FILES.txt', '\n'.join(missing) + '\n')
+    yield buffer.pop()
+
+
+class _Echo:
+    """Pseudo-buffer for csv.writer: writerow() returns the formatted line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def export_columns(form_template):
+    return [field.get('name') for field in form_template.form_fields]
+
+
+def _export_rows(form_template, submissions):
+    """One flat row per submission in form_fields order, reading only the data column in chunks."""
+    columns = export_columns(form_template)
+    for data in submissions.values_list('data', flat=True).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        row = []
+        for column in columns:
+            value = data.get(column)
+            if isinstance(value, list):
+                value = ", ".join(str(v) for v in value)
+            row.append('' if value is None else value)
+        yield row
+
+
+def stream_submissions_csv(form_template, submissions):
+    """Yields the CSV export in chunks of rows, without materializing the submissions."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(export_columns(form_template))
+    lines = []
+    for row in _export_rows(form_template, submissions):
+        lines.append(writer.writerow(row))
+        if len(lines) >= EXPORT_CHUNK_SIZE:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def write_submissions_xlsx(form_template, submissions):
+    """
+    Writes the XLSX export to a temporary file and returns it rewound.
+    openpyxl's write-only mode streams rows to disk, so memory stays flat regardless of row count.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title='Submissions')
+    sheet.append(export_columns(form_template))
+    for row in _export_rows(form_template, submissions):
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
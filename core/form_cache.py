@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+
+from .models import FormTemplate
+
+# Every key of a form embeds its current version; bumping the version on save/delete orphans the old entries.
+# With the local-memory backend each process holds its own copy, so other processes may serve the old form
+# for up to FORM_CACHE_TIMEOUT seconds; configure REDIS_URL for immediate invalidation everywhere.
+
+
+def _version_key(slug):
+    return f'form:{slug}:version'
+
+
+def _version(slug):
+    version = cache.get(_version_key(slug))
+    if version is None:
+        cache.add(_version_key(slug), 1, None)
+        version = cache.get(_version_key(slug), 1)
+    return version
+
+
+def _key(slug, part):
+    return f'form:{slug}:v{_version(slug)}:{part}'
+
+
+def get_form_template(slug):
+    """The FormTemplate for a public slug, served from cache; raises Http404 if there is none."""
+    key = _key(slug, 'object')
+    form_template = cache.get(key)
+    if form_template is None:
+        form_template = get_object_or_404(FormTemplate, slug=slug)
+        cache.set(key, form_template, settings.FORM_CACHE_TIMEOUT)
+    return form_template
+
+
+def get_rendered_form(slug, render):
+    """Rendered HTML of the public form, calling render() only on a cache miss."""
+    # Keyed by the static files manifest too, so a deploy never serves cached pages pointing at replaced asset URLs
+    key = _key(slug, f'html:{getattr(staticfiles_storage, "manifest_hash", "")}')
+    html = cache.get(key)
+    if html is None:
+        html = render()
+        cache.set(key, html, settings.FORM_CACHE_TIMEOUT)
+    return html
+
+
+def invalidate_form(slug):
+    try:
+        cache.incr(_version_key(slug))
+    except ValueError:
+        cache.set(_version_key(slug), 2, None)
@@ -0,0 +1,201 @@
+import io
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from .metrics import timer
+from .segmentation import predict_masks
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_PHOTO_FORMATS = {'JPEG', 'PNG', 'WEBP'}
+
+
+class PhotoRejected(ValueError):
+    """Raised when an uploaded photo fails the cheap pre-checks and must not be processed."""
+
+
+class BackgroundCache:
+    """
+    In-process LRU cache of decoded, resized background images keyed by (template id, background file, size).
+    Entries are evicted least-recently-used once their decoded size exceeds max_bytes.
+    The cache lives in every process that composites (photo workers and web), so it is never invalidated explicitly:
+    backgrounds are stored content-addressed (see core.blobs), so a changed background always has a new file name
+    and misses the cache everywhere, while entries for the old one simply age out.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, form_template, size):
+        key = (form_template.id, form_template.background_image.name, size)
+        with self._lock:
+            background = self._entries.get(key)
+            if background is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return background
+            self.misses += 1
+
+        background = Image.open(form_template.background_image).convert("RGBA").resize(size)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = background
+                self._size += self._image_bytes(background)
+                while self._size > self.max_bytes and len(self._entries) > 1:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= self._image_bytes(evicted)
+        return background
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries), 'bytes': self._size}
+
+    @staticmethod
+    def _image_bytes(image):
+        return image.width * image.height * len(image.getbands())
+
+
+background_cache = BackgroundCache(settings.BACKGROUND_CACHE_MAX_BYTES)
+
+
+def processed_photo_name(original_name):
+    return f'processed_{os.path.basename(original_name)}.jpg'
+
+
+def cutout_photo_name(original_name):
+    return f'cutout_{os.path.basename(original_name)}.png'
+
+
+def inspect_photo(image_file):
+    """
+    Checks an upload from its header only (format, dimensions, decompression-bomb limit) without decoding pixels.
+    Returns (format, size) or raises PhotoRejected.
+    """
+    try:
+        with Image.open(image_file) as image:
+            image_format, size = image.format, image.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise PhotoRejected('The photo is not a readable image.')
+    finally:
+        image_file.seek(0)
+
+    if image_format not in ALLOWED_PHOTO_FORMATS:
+        raise PhotoRejected('The photo must be a JPEG, PNG or WebP image.')
+    if size[0] * size[1] > settings.PHOTO_MAX_PIXELS:
+        raise PhotoRejected('The photo is too large.')
+    if min(size) < settings.PHOTO_MIN_SIDE:
+        raise PhotoRejected('The photo is too small.')
+    return image_format, size
+
+
+def load_photo(image_file):
+    """
+    Decodes an upload as upright RGBA no larger than PHOTO_MAX_OUTPUT_SIDE, the most the card and the renditions
+    use, after the header checks of inspect_photo. JPEGs are decoded with draft(), letting libjpeg downscale
+    during decode instead of materializing every pixel of a large photo.
+    """
+    inspect_photo(image_file)
+    max_side = settings.PHOTO_MAX_OUTPUT_SIDE
+    image = Image.open(image_file)
+    if image.format == 'JPEG':
+        image.draft('RGB', (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return image.convert("RGBA")
+
+
+def cut_out_subjects(images):
+    """
+    Removes the background from each image, segmenting them together in one batch.
+    The model works at a low resolution anyway, so it is fed copies no larger than SEGMENTATION_INPUT_SIZE
+    and the masks are upsampled back only for images that were reduced.
+    """
+    input_size = settings.SEGMENTATION_INPUT_SIZE
+    model_inputs = []
+    for image in images:
+        if max(image.size) > input_size:
+            image = image.copy()
+            image.thumbnail((input_size, input_size), Image.BILINEAR)
+        model_inputs.append(image)
+
+    masks = predict_masks(model_inputs)
+    cutouts = []
+    for image, mask in zip(images, masks):
+        if mask.size != image.size:
+            mask = mask.resize(image.size, Image.BILINEAR)
+        # Same cut-out rembg.remove() produces when alpha matting is off
+        empty = Image.new('RGBA', image.size, 0)
+        cutouts.append(Image.composite(image, empty, mask))
+    return cutouts
+
+
+def apply_background(cutout, form_template):
+    """Composites an RGBA cut-out onto the form's background color or image."""
+    with timer('photo_stage_seconds', stage='composite'):
+        if form_template.background_type == 'color':
+            background = Image.new('RGBA', cutout.size, form_template.background_color)
+        else:
+            if not form_template.background_image:
+                background = Image.new('RGBA', cutout.size, '#FFFFFF') # Fallback
+            else:
+                background = background_cache.get(form_template, cutout.size)
+
+        return Image.alpha_composite(background, cutout).convert("RGB")
+
+
+def encode_jpeg(image, name):
+    with timer('photo_stage_seconds', stage='encode'):
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=90)
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+def encode_png(image, name):
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+def segment_photo(image_file):
+    """
+    Returns the RGBA cut-out of an uploaded photo, or None if processing failed in a way worth retrying.
+    Raises PhotoRejected for a photo that fails the pre-checks, since retrying can't change that outcome.
+    """
+    name = getattr(image_file, 'name', image_file)
+    try:
+        with timer('photo_stage_seconds', stage='decode') as decode:
+            input_image = load_photo(image_file)
+        with timer('photo_stage_seconds', stage='segmentation') as segmentation:
+            cutout = cut_out_subjects([input_image])[0]
+        logger.info("Segmented %s (%sx%s): decode %.0fms, segmentation %.0fms", name, *input_image.size,
+                    decode.seconds * 1000, segmentation.seconds * 1000)
+        return cutout
+    except PhotoRejected as e:
+        logger.warning("Rejected photo %s: %s", name, e)
+        raise
+    except Exception as e:
+        logger.exception("Error removing background from %s: %s", name, e)
+        return None
+
+
+def process_photo(image_file, form_template):
+    """
+    Removes background from an image and applies a new background color or image.
+    Returns None if background removal failed; raises PhotoRejected like segment_photo.
+    """
+    output_image = segment_photo(image_file)
+    if output_image is None:
+        return None
+    final_image = apply_background(output_image, form_template)
+    return encode_jpeg(final_image, processed_photo_name(image_file.name))
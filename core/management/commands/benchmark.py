@@ -0,0 +1,225 @@
+# core/management/commands/benchmark.py
+
+import io
+import os
+import json
+import time
+import random
+import platform
+import tempfile
+import statistics
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageDraw
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from core.exports import stream_photos_zip, stream_submissions_csv, write_submissions_xlsx
+from core.image_processing import process_photo
+from core.models import FormTemplate, StudentSubmission
+from core.segmentation import init_worker
+
+BENCHMARK_FIELDS = [
+    {'name': 'Full Name', 'type': 'text', 'required': True, 'options': []},
+    {'name': 'Roll Number', 'type': 'text', 'required': True, 'options': []},
+    {'name': 'Class', 'type': 'select', 'required': True, 'options': ['A', 'B', 'C']},
+    {'name': 'Hobbies', 'type': 'checkbox', 'required': False, 'options': ['Chess', 'Music', 'Sports']},
+]
+
+
+def synthetic_photo(seed, size=512):
+    """A JPEG resembling a cropped headshot: a gradient backdrop with a head-and-shoulders silhouette."""
+    rng = random.Random(seed)
+    image = Image.new('RGB', (size, size))
+    draw = ImageDraw.Draw(image)
+    top, bottom = [tuple(rng.randint(60, 230) for _ in range(3)) for _ in range(2)]
+    for y in range(size):
+        t = y / size
+        draw.line([(0, y), (size, y)], fill=tuple(int(a + (b - a) * t) for a, b in zip(top, bottom)))
+    skin = tuple(rng.randint(120, 230) for _ in range(3))
+    cloth = tuple(rng.randint(0, 120) for _ in range(3))
+    draw.ellipse([size * 0.15, size * 0.7, size * 0.85, size * 1.3], fill=cloth)
+    draw.ellipse([size * 0.32, size * 0.18, size * 0.68, size * 0.68], fill=skin)
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    cuts = statistics.quantiles(samples, n=100, method='inclusive') if len(samples) > 1 else samples * 99
+    return {
+        'n': len(samples),
+        'mean': statistics.fmean(samples),
+        'p50': cuts[49],
+        'p90': cuts[89],
+        'p99': cuts[98],
+        'max': samples[-1],
+    }
+
+
+def _process_sample(photo_bytes):
+    form_template = FormTemplate(background_type='color', background_color='#3366CC')
+    return process_photo(SimpleUploadedFile('sample.jpg', photo_bytes), form_template) is not None
+
+
+def _measure(func):
+    """Runs func twice: once for wall time, once under tracemalloc for peak Python memory."""
+    started = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - started
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'seconds': seconds, 'peak_bytes': peak}
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks photo processing, submission throughput and exports on synthetic data and writes a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--photos', type=int, default=20, help='Photos processed for the latency measurement.')
+        parser.add_argument('--workers', default='1,2,4', help='Comma-separated worker counts for the throughput measurement.')
+        parser.add_argument('--posts', type=int, default=50, help='Submissions POSTed through the public form.')
+        parser.add_argument('--rows', default='1000,10000', help='Comma-separated submission counts for the export measurements.')
+        parser.add_argument('--zip-photos', type=int, default=200, help='Processed photos included in the ZIP export measurement.')
+        parser.add_argument('--sample-dir', help='Use the JPEGs in this directory instead of synthetic photos.')
+        parser.add_argument('--skip-photos', action='store_true', help='Skip the photo processing measurements.')
+        parser.add_argument('--output', default='benchmark_report.json')
+
+    def handle(self, *args, **options):
+        samples = self._samples(options)
+        report = {
+            'started_at': timezone.now().isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'rembg_model': settings.REMBG_MODEL,
+                'database': connections['default'].vendor,
+            },
+        }
+
+        if not options['skip_photos']:
+            report['process_photo'] = self._photo_latency(samples, options['photos'])
+            report['throughput'] = self._photo_throughput(samples, options)
+
+        # Everything touching the database runs in a transaction that is rolled back, with media in a temp dir
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root, CELERY_BROKER_URL=''):
+            with transaction.atomic():
+                form_template = FormTemplate.objects.create(
+                    admin=User.objects.create(username=f'benchmark-{time.time_ns()}'),
+                    title='Benchmark Form', form_fields=BENCHMARK_FIELDS,
+                )
+                report['submission_post'] = self._submission_posts(form_template, samples, options['posts'])
+                report['exports'] = self._exports(form_template, samples, options)
+                transaction.set_rollback(True)
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Benchmark report written to {options['output']}"))
+
+    def _samples(self, options):
+        if options['sample_dir']:
+            paths = sorted(p for p in os.listdir(options['sample_dir']) if p.lower().endswith(('.jpg', '.jpeg')))
+            samples = []
+            for path in paths:
+                with open(os.path.join(options['sample_dir'], path), 'rb') as f:
+                    samples.append(f.read())
+            if samples:
+                return samples
+        return [synthetic_photo(seed) for seed in range(8)]
+
+    def _photo_latency(self, samples, count):
+        _process_sample(samples[0])  # Loads the model outside the measurement
+        latencies = []
+        for i in range(count):
+            started = time.perf_counter()
+            _process_sample(samples[i % len(samples)])
+            latencies.append(time.perf_counter() - started)
+        result = percentiles(latencies)
+        self.stdout.write(f"process_photo: p50 {result['p50'] * 1000:.0f}ms, p90 {result['p90'] * 1000:.0f}ms, p99 {result['p99'] * 1000:.0f}ms")
+        return result
+
+    def _photo_throughput(self, samples, options):
+        results = []
+        connections.close_all()
+        for workers in [int(w) for w in options['workers'].split(',') if w.strip()]:
+            batch = [samples[i % len(samples)] for i in range(max(options['photos'], workers * 4))]
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+                list(pool.map(_process_sample, samples[:1] * workers))  # Warm every worker
+                started = time.perf_counter()
+                list(pool.map(_process_sample, batch))
+                elapsed = time.perf_counter() - started
+            results.append({'workers': workers, 'images': len(batch), 'images_per_sec': len(batch) / elapsed})
+            self.stdout.write(f'{workers} worker(s): {len(batch) / elapsed:.2f} images/sec')
+        return results
+
+    def _submission_posts(self, form_template, samples, count):
+        client = Client()
+        url = f'/form/{form_template.slug}/'
+        latencies = []
+        failed = 0
+        for i in range(count):
+            payload = {
+                'Full Name': f'Student {i}', 'Roll Number': str(i), 'Class': 'A', 'Hobbies': ['Chess'],
+                'photo': SimpleUploadedFile('photo.jpg', samples[i % len(samples)], content_type='image/jpeg'),
+            }
+            started = time.perf_counter()
+            response = client.post(url, payload)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'POST failed with {response.status_code}: {response.content[:200]}'))
+        result = percentiles(latencies)
+        result['per_sec'] = count / sum(latencies)
+        result['failed'] = failed
+        self.stdout.write(f"submission POST: {result['per_sec']:.1f}/sec, p50 {result['p50'] * 1000:.0f}ms")
+        return result
+
+    def _exports(self, form_template, samples, options):
+        photo_names = []
+        for i in range(min(options['zip_photos'], len(samples))):
+            name = f'processed_photos/benchmark_{i}.jpg'
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(samples[i])
+            photo_names.append(name)
+
+        results = []
+        created = form_template.submissions.count()
+        for rows in sorted(int(r) for r in options['rows'].split(',') if r.strip()):
+            batch = []
+            for i in range(created, rows):
+                photo = photo_names[i % len(photo_names)] if i < options['zip_photos'] else ''
+                batch.append(StudentSubmission(
+                    form_template=form_template,
+                    data={'Full Name': f'Student {i}', 'Roll Number': str(i), 'Class': 'B', 'Hobbies': ['Music', 'Sports']},
+                    original_photo='original_photos/benchmark.jpg', processed_photo=photo,
+                    processing_status=StudentSubmission.STATUS_DONE,
+                ))
+            StudentSubmission.objects.bulk_create(batch, batch_size=1000)
+            created = max(created, rows)
+
+            submissions = form_template.submissions.order_by('id')
+            with_photos = submissions.exclude(processed_photo='')
+            result = {
+                'rows': rows,
+                'csv': _measure(lambda: sum(len(chunk) for chunk in stream_submissions_csv(form_template, submissions))),
+                'xlsx': _measure(lambda: write_submissions_xlsx(form_template, submissions).close()),
+                'zip': _measure(lambda: sum(len(chunk) for chunk in stream_photos_zip(with_photos.iterator(chunk_size=500)))),
+            }
+            results.append(result)
+            self.stdout.write(
+                f"{rows} rows: CSV {result['csv']['seconds']:.2f}s, XLSX {result['xlsx']['seconds']:.2f}s, "
+                f"ZIP {result['zip']['seconds']:.2f}s"
+            )
+        return results
@@ -0,0 +1,35 @@
+# core/management/commands/build_css.py
+
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.assets import PUBLIC_CSS_PATH, build_public_css
+
+
+class Command(BaseCommand):
+    help = "Builds the public form's stylesheet from the utility classes its templates and scripts use"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Fail instead of writing if the committed stylesheet is out of date or misses a class (for CI).')
+
+    def handle(self, *args, **options):
+        css, unsupported = build_public_css()
+        for class_name in unsupported:
+            self.stderr.write(self.style.WARNING(f'No rule for class "{class_name}"; add it to core/assets.py.'))
+
+        path = Path(settings.BASE_DIR) / PUBLIC_CSS_PATH
+        current = path.read_text(encoding='utf-8') if path.exists() else ''
+        if options['check']:
+            if unsupported:
+                raise CommandError(f'{len(unsupported)} class(es) have no rule; the pages would render them unstyled.')
+            if current != css:
+                raise CommandError(f'{PUBLIC_CSS_PATH} is out of date; run `python manage.py build_css`.')
+            self.stdout.write(self.style.SUCCESS(f'{PUBLIC_CSS_PATH} is up to date.'))
+            return
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(css, encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f'Wrote {PUBLIC_CSS_PATH} ({len(css.encode())} bytes).'))
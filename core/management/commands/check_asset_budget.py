@@ -0,0 +1,69 @@
+# core/management/commands/check_asset_budget.py
+
+import gzip
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.test.utils import override_settings
+
+from core.models import FormTemplate
+
+# One field of each type, so every branch of the form template is rendered
+SAMPLE_FIELDS = [
+    {'name': 'Full Name', 'type': 'text', 'required': True},
+    {'name': 'Address', 'type': 'textarea', 'required': False},
+    {'name': 'Class', 'type': 'select', 'required': True, 'options': ['A', 'B']},
+    {'name': 'House', 'type': 'radio', 'required': False, 'options': ['Red', 'Blue']},
+    {'name': 'Hobbies', 'type': 'checkbox', 'required': False, 'options': ['Music', 'Sport']},
+    {'name': 'Document', 'type': 'file', 'required': False},
+]
+PAGES = ['public_form/student_form.html', 'public_form/success.html']
+_ASSET_REFERENCE = re.compile(r'<(?:link|script|img)\b[^>]*?\s(?:href|src)="([^"]+)"')
+
+
+def compressed_size(data):
+    return len(gzip.compress(data, compresslevel=9))
+
+
+class Command(BaseCommand):
+    help = 'Fails if a public form page loads third-party assets or more compressed bytes than the budget on first visit'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget', type=int, default=settings.PUBLIC_FORM_BYTE_BUDGET,
+                            help='Gzipped bytes allowed per page, HTML included.')
+
+    def handle(self, *args, **options):
+        form = FormTemplate(title='Budget check', slug='budget-check', form_fields=SAMPLE_FIELDS)
+        failures = []
+        # Plain storage, so pages render from source files whether or not collectstatic has run
+        with override_settings(STORAGES={**settings.STORAGES, 'staticfiles': {
+            'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+        }}):
+            for page in PAGES:
+                html = render_to_string(page, {'form': form}).encode()
+                rows = [(page, len(html), compressed_size(html))]
+                for url in _ASSET_REFERENCE.findall(html.decode()):
+                    if not url.startswith(settings.STATIC_URL) and not url.startswith('/' + settings.STATIC_URL):
+                        failures.append(f'{page} loads {url}; vendor it into core/static instead.')
+                        continue
+                    path = finders.find(url.split(settings.STATIC_URL, 1)[1])
+                    if path is None:
+                        failures.append(f'{page} references missing static file {url}.')
+                        continue
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                    rows.append((url, len(data), compressed_size(data)))
+
+                total = sum(size for _, _, size in rows)
+                for name, raw, size in rows:
+                    self.stdout.write(f'  {name:<50} {raw:>8} B  {size:>7} B gzipped')
+                self.stdout.write(f'{page}: {total} of {options["budget"]} B gzipped')
+                if total > options['budget']:
+                    failures.append(f'{page} loads {total} B gzipped, over the {options["budget"]} B budget.')
+
+        if failures:
+            raise CommandError('\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('All public form pages are within the asset budget.'))
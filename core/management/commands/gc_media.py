@@ -0,0 +1,168 @@
+# core/management/commands/gc_media.py
+
+import os
+import time
+from functools import reduce
+from operator import or_
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.db.models import Q
+from django.core.management.base import BaseCommand
+
+from core.chunked_uploads import discard_expired_uploads, expired_uploads
+from core.derivatives import RENDITIONS, derivative_name
+from core.models import CardExport, ChunkedUpload, FormTemplate, StudentSubmission
+
+# Directories under MEDIA_ROOT whose files are owned by database rows; anything else is left alone
+MANAGED_DIRS = ['original_photos', 'processed_photos', 'cutouts', 'derivatives', 'extra_uploads', 'backgrounds', 'client_logos', 'card_exports']
+
+
+def _values(value):
+    if isinstance(value, list):
+        for item in value:
+            yield from _values(item)
+    elif isinstance(value, str):
+        yield value
+
+
+def referenced_paths(chunk_size):
+    """
+    Storage names referenced by any row. Files can be shared (duplicated forms, content-addressed uploads
+    and renditions), so a file is only garbage once no row at all points to it.
+    """
+    referenced = set()
+    for logo, background in FormTemplate.objects.values_list('client_logo', 'background_image').iterator(chunk_size=chunk_size):
+        referenced.update(name for name in (logo, background) if name)
+    # Completed chunked uploads waiting for the submission that will reference them
+    referenced.update(ChunkedUpload.objects.exclude(stored_name='').values_list('stored_name', flat=True))
+    referenced.update(CardExport.objects.exclude(file='').values_list('file', flat=True))
+
+    media_url = settings.MEDIA_URL
+    submissions = StudentSubmission.objects.values_list(
+        'original_photo', 'processed_photo', 'cutout_photo', 'processed_photo_digest', 'data',
+    ).iterator(chunk_size=chunk_size)
+    for original, processed, cutout, digest, data in submissions:
+        referenced.update(name for name in (original, processed, cutout) if name)
+        if digest:
+            referenced.update(derivative_name(digest, rendition) for rendition in RENDITIONS)
+        # Extra file fields store the file's URL in the submission data
+        for value in _values(list((data or {}).values())):
+            if value.startswith(media_url):
+                referenced.add(unquote(value[len(media_url):]))
+    return referenced
+
+
+def referenced_among(names):
+    """
+    The names in names that a row references now. Rows saved since referenced_paths() ran, such as uploads
+    deduplicated onto an orphaned blob, are caught here just before their files would be unlinked.
+    """
+    names = set(names)
+    referenced = set()
+    templates = FormTemplate.objects.filter(Q(client_logo__in=names) | Q(background_image__in=names))
+    for logo, background in templates.values_list('client_logo', 'background_image'):
+        referenced.update({logo, background})
+    referenced.update(ChunkedUpload.objects.filter(stored_name__in=names).values_list('stored_name', flat=True))
+    referenced.update(CardExport.objects.filter(file__in=names).values_list('file', flat=True))
+    for photos in StudentSubmission.objects.filter(
+        Q(original_photo__in=names) | Q(processed_photo__in=names) | Q(cutout_photo__in=names)
+    ).values_list('original_photo', 'processed_photo', 'cutout_photo'):
+        referenced.update(photos)
+
+    derivatives = {name: os.path.basename(name).split('_')[0] for name in names if name.startswith('derivatives/')}
+    digests = set(StudentSubmission.objects.filter(processed_photo_digest__in=set(derivatives.values()))
+                  .values_list('processed_photo_digest', flat=True))
+    referenced.update(name for name, digest in derivatives.items() if digest in digests)
+
+    extra_uploads = [name for name in names if name.startswith('extra_uploads/')]
+    if extra_uploads:
+        submissions = StudentSubmission.objects.filter(reduce(or_, (Q(data__icontains=name) for name in extra_uploads)))
+        for data in submissions.values_list('data', flat=True):
+            for value in _values(list((data or {}).values())):
+                if value.startswith(settings.MEDIA_URL):
+                    referenced.add(unquote(value[len(settings.MEDIA_URL):]))
+    return referenced & names
+
+
+def scan(directory):
+    """Yields os.DirEntry objects for every file below directory without listing whole trees into memory."""
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from scan(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+class Command(BaseCommand):
+    help = 'Deletes media files that no form or submission references any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Files deleted per batch.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows read per database query.')
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help='Seconds since a file was last modified before it may be deleted; protects uploads whose row is not saved yet.')
+
+    def handle(self, *args, **options):
+        media_root = os.path.realpath(settings.MEDIA_ROOT)
+        if options['dry_run']:
+            self.stdout.write(f'Would discard {expired_uploads().count()} expired chunked upload(s).')
+        else:
+            self.stdout.write(f'Discarded {discard_expired_uploads()} expired chunked upload(s).')
+        referenced = referenced_paths(options['chunk_size'])
+        self.stdout.write(f'{len(referenced)} referenced file(s) in the database.')
+
+        cutoff = time.time() - options['min_age']
+        scanned = deleted = reclaimed = 0
+        batch = []
+        for directory in MANAGED_DIRS:
+            for entry in scan(os.path.join(media_root, directory)):
+                scanned += 1
+                name = os.path.relpath(entry.path, media_root).replace(os.sep, '/')
+                if name in referenced:
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime > cutoff:
+                    continue
+                batch.append((name, entry.path, stat.st_size))
+                if len(batch) >= options['batch_size']:
+                    count, size = self._delete(batch, cutoff, options['dry_run'])
+                    deleted, reclaimed, batch = deleted + count, reclaimed + size, []
+        count, size = self._delete(batch, cutoff, options['dry_run'])
+        deleted, reclaimed = deleted + count, reclaimed + size
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {scanned} file(s). {verb} {deleted} orphaned file(s), reclaiming {reclaimed / (1024 * 1024):.1f} MB.'
+        ))
+
+    def _delete(self, batch, cutoff, dry_run):
+        deleted = reclaimed = 0
+        # The scan may have run for a while: skip files reused or referenced since it started
+        referenced = referenced_among(name for name, _, _ in batch) if batch else set()
+        for name, path, size in batch:
+            if name in referenced:
+                continue
+            try:
+                if os.stat(path).st_mtime > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            if dry_run:
+                self.stdout.write(f'Would delete {path}')
+            else:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+            deleted += 1
+            reclaimed += size
+        if batch and not dry_run:
+            self.stdout.write(f'Deleted {deleted} file(s)...')
+        return deleted, reclaimed
@@ -0,0 +1,34 @@
+# core/management/commands/import_roster.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import FormTemplate
+from core.roster import ROSTER_CHUNK_SIZE, RosterError, import_roster
+
+
+class Command(BaseCommand):
+    help = 'Pre-creates submissions from a CSV/XLSX roster keyed by Roll Number; students then only upload a photo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('form_id', type=int)
+        parser.add_argument('path', help='CSV or XLSX file with a header row matching the form fields.')
+        parser.add_argument('--chunk-size', type=int, default=ROSTER_CHUNK_SIZE, help='Rows written per transaction.')
+
+    def handle(self, *args, **options):
+        try:
+            form_template = FormTemplate.objects.get(id=options['form_id'])
+        except FormTemplate.DoesNotExist:
+            raise CommandError(f"Form {options['form_id']} does not exist.")
+
+        try:
+            with open(options['path'], 'rb') as f:
+                result = import_roster(form_template, f, options['path'], options['chunk_size'])
+        except (OSError, RosterError) as e:
+            raise CommandError(str(e))
+
+        for line, error in result.errors:
+            self.stderr.write(f'Row {line}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {result.created} and updated {result.updated} submission(s), skipped {len(result.errors)} row(s) '
+            f'in {result.seconds:.1f}s ({result.rows_per_second:.0f} rows/sec).'
+        ))
@@ -0,0 +1,36 @@
+# core/management/commands/rebuild_search_index.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import StudentSubmission, SubmissionSearchTerm
+from core.search import build_terms
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the submission search index from submission data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', type=int, dest='form_id', help='Only rebuild the index of this form.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        submissions = StudentSubmission.objects.only('id', 'form_template_id', 'data').order_by('id')
+        terms = SubmissionSearchTerm.objects.all()
+        if options['form_id']:
+            submissions = submissions.filter(form_template_id=options['form_id'])
+            terms = terms.filter(form_template_id=options['form_id'])
+
+        with transaction.atomic():
+            terms.delete()
+            indexed = 0
+            batch = []
+            for submission in submissions.iterator(chunk_size=options['batch_size']):
+                batch.extend(build_terms(submission))
+                indexed += 1
+                if len(batch) >= options['batch_size']:
+                    SubmissionSearchTerm.objects.bulk_create(batch)
+                    batch = []
+            SubmissionSearchTerm.objects.bulk_create(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} submission(s).'))
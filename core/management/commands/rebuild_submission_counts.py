@@ -0,0 +1,21 @@
+# core/management/commands/rebuild_submission_counts.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from core.models import FormTemplate
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the cached submission count of every form'
+
+    def handle(self, *args, **kwargs):
+        fixed = 0
+        with transaction.atomic():
+            forms = FormTemplate.objects.select_for_update().annotate(num_submissions=Count('submissions'))
+            for form_template in forms:
+                if form_template.submission_count != form_template.num_submissions:
+                    FormTemplate.objects.filter(id=form_template.id).update(submission_count=form_template.num_submissions)
+                    fixed += 1
+        self.stdout.write(self.style.SUCCESS(f'Submission counts rebuilt ({fixed} form(s) corrected).'))
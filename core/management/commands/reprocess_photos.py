@@ -0,0 +1,84 @@
+# core/management/commands/reprocess_photos.py
+
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.models import FormTemplate, StudentSubmission
+from core.segmentation import init_worker
+
+logger = logging.getLogger(__name__)
+
+
+def _reprocess(submission_ids):
+    from core.tasks import reprocess_batch
+    try:
+        return reprocess_batch(submission_ids)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Regenerates processed photos for every submission of a form, e.g. after its background changed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('form_id', type=int)
+        parser.add_argument('--batch-size', type=int, default=8, help='Images segmented per inference call.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of worker processes.')
+        parser.add_argument('--force', action='store_true', help='Also reprocess photos already made with the current background.')
+
+    def handle(self, *args, **options):
+        try:
+            form_template = FormTemplate.objects.get(id=options['form_id'])
+        except FormTemplate.DoesNotExist:
+            raise CommandError(f"Form {options['form_id']} does not exist.")
+
+        submissions = form_template.submissions.exclude(original_photo='')
+        if not options['force']:
+            # Photos already made with the current background are skipped, so an interrupted run resumes where it stopped
+            submissions = submissions.exclude(
+                processed_background=form_template.background_signature(),
+                processing_status=StudentSubmission.STATUS_DONE,
+            )
+        submission_ids = list(submissions.order_by('id').values_list('id', flat=True))
+        total = len(submission_ids)
+        if not total:
+            self.stdout.write(self.style.SUCCESS('All photos are up to date.'))
+            return
+
+        batch_size = max(1, options['batch_size'])
+        workers = max(1, options['workers'])
+        batches = [submission_ids[i:i + batch_size] for i in range(0, total, batch_size)]
+        self.stdout.write(f'Reprocessing {total} photo(s) for "{form_template.title}" in {len(batches)} batch(es) across {workers} process(es)...')
+
+        # Worker processes are forked, so they must not inherit this process's open DB connection
+        connections.close_all()
+        processed = failed = 0
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            futures = {pool.submit(_reprocess, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                try:
+                    done, errors = future.result()
+                except Exception:
+                    # E.g. a worker process was killed; its claimed rows are taken over once their claim goes stale
+                    logger.exception("Reprocessing batch %s crashed", futures[future])
+                    done, errors = 0, len(futures[future])
+                processed += done
+                failed += errors
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'  {processed + failed}/{total} ({processed / elapsed:.2f} images/sec)')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Reprocessed {processed} photo(s) in {elapsed:.1f}s ({processed / elapsed:.2f} images/sec).'
+        ))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} photo(s) failed and were marked failed.'))
+        skipped = total - processed - failed
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'{skipped} photo(s) were being processed by a photo worker and were skipped.'))
@@ -0,0 +1,74 @@
+# core/management/commands/run_photo_worker.py
+
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.segmentation import preload
+from core.tasks import due_submissions, pending_card_exports, release_claim, release_stale_claims, run_card_export, run_photo_job
+
+logger = logging.getLogger(__name__)
+
+
+def _run_job(submission_id):
+    try:
+        return run_photo_job(submission_id)
+    except Exception:
+        logger.exception("Photo job for submission %s crashed", submission_id)
+        return release_claim(submission_id, 'Photo processing crashed.') or 'error'
+    finally:
+        close_old_connections()
+
+
+def _run_export(export_id):
+    try:
+        return run_card_export(export_id)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Processes pending submission photos and ID card exports from the database queue (used when no Celery broker is configured)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of photos processed in parallel.')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit.')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        if settings.REMBG_PRELOAD:
+            preload()
+        self.stdout.write(self.style.SUCCESS(f'Photo worker started with {workers} worker(s).'))
+
+        # Card exports render on their own thread (with a process pool of their own), so photos keep flowing meanwhile
+        with ThreadPoolExecutor(max_workers=workers) as pool, ThreadPoolExecutor(max_workers=1) as export_pool:
+            export = None
+            while True:
+                released = release_stale_claims()
+                if released:
+                    self.stdout.write(self.style.WARNING(f'Re-queued {released} stale job(s).'))
+
+                if export is not None and export[1].done():
+                    self.stdout.write(f'Card export {export[0]}: {export[1].result()}')
+                    export = None
+                if export is None:
+                    export_id = pending_card_exports().order_by('created_at').values_list('id', flat=True).first()
+                    if export_id is not None:
+                        export = (export_id, export_pool.submit(_run_export, export_id))
+
+                pending_ids = list(due_submissions().values_list('id', flat=True)[:workers * 4])
+                if not pending_ids:
+                    if options['once'] and export is None:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                for submission_id, status in zip(pending_ids, pool.map(_run_job, pending_ids)):
+                    if status:
+                        self.stdout.write(f'Submission {submission_id}: {status}')
@@ -0,0 +1,120 @@
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(labels, **extra):
+    labels = labels + [f'{k}="{v}"' for k, v in extra.items()]
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram of durations, one series per label set."""
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = [f'{k}="{v}"' for k, v in key]
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f'{self.name}_bucket{_labels(labels, le=bound)} {count}')
+                lines.append(f'{self.name}_bucket{_labels(labels, le="+Inf")} {series["count"]}')
+                lines.append(f'{self.name}_sum{_labels(labels)} {series["sum"]}')
+                lines.append(f'{self.name}_count{_labels(labels)} {series["count"]}')
+        return lines
+
+
+HISTOGRAMS = {
+    'submission_stage_seconds': Histogram('submission_stage_seconds', 'Time spent in each stage of a public form submission.'),
+    'photo_stage_seconds': Histogram('photo_stage_seconds', 'Time spent in each stage of photo processing.'),
+    'export_seconds': Histogram('export_seconds', 'Time taken to produce a full export.', buckets=DEFAULT_BUCKETS + (60.0, 300.0)),
+}
+
+
+class Timer:
+    def __init__(self):
+        self.seconds = 0.0
+
+
+def _record(name, seconds, labels):
+    if not settings.METRICS_ENABLED:
+        return
+    HISTOGRAMS[name].observe(seconds, **labels)
+    if settings.METRICS_LOG:
+        logger.info(json.dumps({'metric': name, 'seconds': round(seconds, 6), **labels}))
+
+
+@contextmanager
+def timer(name, **labels):
+    """
+    Times the block and records it in the named histogram. The measured duration is always available
+    as .seconds on the yielded Timer; recording is skipped entirely when METRICS_ENABLED is off.
+    """
+    result = Timer()
+    started = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result.seconds = time.perf_counter() - started
+        _record(name, result.seconds, labels)
+
+
+def timed_stream(iterable, name, **labels):
+    """Wraps a response generator so the time to produce all of it is recorded once it is exhausted."""
+    started = time.perf_counter()
+    yield from iterable
+    _record(name, time.perf_counter() - started, labels)
+
+
+def render_prometheus():
+    """All metrics of this process in the Prometheus text exposition format."""
+    from .image_processing import background_cache
+    from .segmentation import session_stats
+
+    lines = []
+    for histogram in HISTOGRAMS.values():
+        lines.extend(histogram.render())
+
+    lines += ['# HELP background_cache_events_total Background image cache lookups.', '# TYPE background_cache_events_total counter']
+    cache_stats = background_cache.stats()
+    lines.append(f'background_cache_events_total{{result="hit"}} {cache_stats["hits"]}')
+    lines.append(f'background_cache_events_total{{result="miss"}} {cache_stats["misses"]}')
+    lines += ['# HELP background_cache_bytes Decoded bytes held by the background image cache.', '# TYPE background_cache_bytes gauge']
+    lines.append(f'background_cache_bytes {cache_stats["bytes"]}')
+
+    lines += ['# HELP segmentation_model_load_seconds Time taken to load each segmentation model.', '# TYPE segmentation_model_load_seconds gauge']
+    for stats in session_stats():
+        lines.append(f'segmentation_model_load_seconds{{model="{stats["model"]}"}} {stats["load_seconds"]}')
+    lines += ['# HELP segmentation_model_memory_bytes Resident memory each segmentation model added when it loaded.',
+              '# TYPE segmentation_model_memory_bytes gauge']
+    for stats in session_stats():
+        if stats['memory_bytes'] is not None:
+            lines.append(f'segmentation_model_memory_bytes{{model="{stats["model"]}"}} {stats["memory_bytes"]}')
+    return '\n'.join(lines) + '\n'
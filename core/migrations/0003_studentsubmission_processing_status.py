@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+
+def mark_processed_submissions_done(apps, schema_editor):
+    StudentSubmission = apps.get_model('core', 'StudentSubmission')
+    StudentSubmission.objects.exclude(processed_photo='').exclude(processed_photo__isnull=True).update(processing_status='done')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_formtemplate_client_logo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentsubmission',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='studentsubmission',
+            name='processing_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='studentsubmission',
+            name='processing_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='studentsubmission',
+            name='processing_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(mark_processed_submissions_done, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_studentsubmission_processing_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentsubmission',
+            name='processed_background',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
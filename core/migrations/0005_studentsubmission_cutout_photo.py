@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_studentsubmission_processed_background'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentsubmission',
+            name='cutout_photo',
+            field=models.ImageField(blank=True, null=True, upload_to='cutouts/'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.0.6 on 2026-10-17 23:04
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# The tokenizer as it was when this migration was written (core.search), frozen so later changes there
+# don't change what the backfill does
+def normalize(value):
+    value = unicodedata.normalize('NFKD', str(value))
+    value = ''.join(c for c in value if not unicodedata.combining(c))
+    return ' '.join(value.casefold().split())[:255]
+
+
+def terms_for_data(data):
+    terms = set()
+    for field, value in (data or {}).items():
+        values = value if isinstance(value, list) else [value]
+        for item in values:
+            if item is None or item == '':
+                continue
+            full = normalize(item)
+            if not full:
+                continue
+            terms.add((field, full))
+            terms.update((field, word) for word in re.findall(r'\w+', full))
+    return terms
+
+
+def index_existing_submissions(apps, schema_editor):
+    StudentSubmission = apps.get_model('core', 'StudentSubmission')
+    SubmissionSearchTerm = apps.get_model('core', 'SubmissionSearchTerm')
+    for submission in StudentSubmission.objects.only('id', 'form_template_id', 'data').iterator(chunk_size=1000):
+        SubmissionSearchTerm.objects.bulk_create([
+            SubmissionSearchTerm(form_template_id=submission.form_template_id, submission_id=submission.id, field=field, term=term)
+            for field, term in terms_for_data(submission.data)
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_studentsubmission_cutout_photo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=255)),
+                ('term', models.CharField(max_length=255)),
+                ('form_template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.formtemplate')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='core.studentsubmission')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['form_template', 'field', 'term'], name='core_search_field_term_idx'), models.Index(fields=['form_template', 'term'], name='core_search_term_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_submissions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_submissionsearchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentsubmission',
+            name='processed_photo_digest',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.6 on 2026-10-17 23:06
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_submissions(apps, schema_editor):
+    FormTemplate = apps.get_model('core', 'FormTemplate')
+    for form_template in FormTemplate.objects.annotate(num_submissions=Count('submissions')):
+        FormTemplate.objects.filter(id=form_template.id).update(submission_count=form_template.num_submissions)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_studentsubmission_processed_photo_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formtemplate',
+            name='submission_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_existing_submissions, migrations.RunPython.noop),
+    ]
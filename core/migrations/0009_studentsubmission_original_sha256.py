@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 23:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_formtemplate_submission_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentsubmission',
+            name='original_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_studentsubmission_original_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formtemplate',
+            name='card_layout',
+            field=models.JSONField(blank=True, default=dict, help_text='ID card options, e.g. {"fields": ["Full Name", "Roll Number"], "accent_color": "#4F46E5"}'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.6 on 2026-10-17 23:15
+
+from django.db import migrations, models
+
+
+# Expression indexes on `data`, written per vendor: Django 5.0 renders KeyTextTransform differently from query
+# to query on SQLite, so a model-level expression index would not be matched there.
+INDEXES = {
+    'sqlite': [
+        'CREATE INDEX IF NOT EXISTS core_sub_roll_number_idx ON core_studentsubmission '
+        '(form_template_id, json_extract(data, \'$."Roll Number"\'))',
+    ],
+    'postgresql': [
+        'CREATE INDEX IF NOT EXISTS core_sub_roll_number_idx ON core_studentsubmission '
+        '(form_template_id, (data ->> \'Roll Number\'))',
+        # Containment (data__contains) lookups
+        'CREATE INDEX IF NOT EXISTS core_sub_data_gin_idx ON core_studentsubmission USING gin (data jsonb_path_ops)',
+    ],
+}
+
+
+def create_data_indexes(apps, schema_editor):
+    for sql in INDEXES.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_data_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor in INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS core_sub_roll_number_idx')
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS core_sub_data_gin_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_formtemplate_card_layout'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentsubmission',
+            index=models.Index(fields=['form_template', '-submitted_at', '-id'], name='core_sub_form_submitted_idx'),
+        ),
+        migrations.RunPython(create_data_indexes, drop_data_indexes),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-17 23:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_studentsubmission_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='studentsubmission',
+            name='original_photo',
+            field=models.ImageField(blank=True, upload_to='original_photos/'),
+        ),
+        migrations.AlterField(
+            model_name='studentsubmission',
+            name='processing_status',
+            field=models.CharField(choices=[('awaiting', 'Awaiting photo'), ('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10),
+        ),
+    ]
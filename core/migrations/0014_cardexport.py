@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-17 23:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardExport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sheet', models.CharField(max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10)),
+                ('cards', models.PositiveIntegerField(default=0)),
+                ('file', models.FileField(blank=True, upload_to='card_exports/')),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('form_template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.formtemplate')),
+            ],
+        ),
+    ]
@@ -17,7 +17,10 @@ class FormTemplate(models.Model):
     background_type = models.CharField(max_length=10, choices=BACKGROUND_CHOICES, default='color')
     background_color = models.CharField(max_length=7, default='#FFFFFF', help_text="Hex color code (e.g., #FFFFFF)")
     background_image = models.ImageField(upload_to='backgrounds/', blank=True, null=True)
+    card_layout = models.JSONField(default=dict, blank=True, help_text="ID card options, e.g. {\"fields\": [\"Full Name\", \"Roll Number\"], \"accent_color\": \"#4F46E5\"}")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Maintained by core.signals; rebuild with `manage.py rebuild_submission_counts`
+    submission_count = models.PositiveIntegerField(default=0, editable=False)
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -30,19 +33,113 @@ class FormTemplate(models.Model):
             self.slug = unique_slug
         super().save(*args, **kwargs)
 
+    def background_signature(self):
+        """Identifies the current background settings; photos processed under a different signature are stale."""
+        if self.background_type == 'image':
+            return f'image:{self.background_image.name}' if self.background_image else 'color:#FFFFFF'
+        return f'color:{self.background_color.upper()}'
+
     def __str__(self):
         return self.title
 
 class StudentSubmission(models.Model):
+    STATUS_AWAITING_PHOTO = 'awaiting'
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_AWAITING_PHOTO, 'Awaiting photo'),
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
     form_template = models.ForeignKey(FormTemplate, on_delete=models.CASCADE, related_name='submissions')
     data = models.JSONField()
-    original_photo = models.ImageField(upload_to='original_photos/')
+    # Empty for students imported from a roster until they submit the form (see core.roster)
+    original_photo = models.ImageField(upload_to='original_photos/', blank=True)
+    # SHA-256 of the uploaded photo; identical uploads share one stored file and their processed output (see core.blobs)
+    original_sha256 = models.CharField(max_length=64, blank=True, default='', db_index=True)
     processed_photo = models.ImageField(upload_to='processed_photos/', blank=True, null=True)
+    # SHA-256 of processed_photo; addresses its cached renditions (see core.derivatives)
+    processed_photo_digest = models.CharField(max_length=64, blank=True, default='')
+    # Background-free RGBA cut-out, kept so a new background only needs re-compositing
+    cutout_photo = models.ImageField(upload_to='cutouts/', blank=True, null=True)
     submitted_at = models.DateTimeField(auto_now_add=True)
+
+    # Background removal runs outside the request; these track the job for each submission
+    processing_status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    processing_attempts = models.PositiveSmallIntegerField(default=0)
+    processing_started_at = models.DateTimeField(blank=True, null=True)
+    processing_error = models.TextField(blank=True, default='')
+    # A failed job waits until then before the database queue picks it up again (see core.tasks.retry_delay)
+    next_attempt_at = models.DateTimeField(blank=True, null=True)
+    # FormTemplate.background_signature() at the time processed_photo was produced
+    processed_background = models.CharField(max_length=255, blank=True, default='')
     
     # Unique identifier for each submission for easier tracking if needed
     submission_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
 
+    class Meta:
+        indexes = [
+            # Submissions page and exports: one form's rows, newest first (see core.pagination)
+            models.Index(fields=['form_template', '-submitted_at', '-id'], name='core_sub_form_submitted_idx'),
+            # The roll number and jsonb indexes on `data` are vendor-specific; see migration 0011
+        ]
+
     def __str__(self):
         # Attempt to get a name from the data for a better representation
-        return f"Submission for {self.form_template.title} - {self.data.get('Full Name', self.id)}"
\ No newline at end of file
+        return f"Submission for {self.form_template.title} - {self.data.get('Full Name', self.id)}"
+
+class SubmissionSearchTerm(models.Model):
+    """Normalized terms of a submission's data, maintained on save so searches hit an index instead of scanning JSON."""
+    form_template = models.ForeignKey(FormTemplate, on_delete=models.CASCADE, related_name='+')
+    submission = models.ForeignKey(StudentSubmission, on_delete=models.CASCADE, related_name='search_terms')
+    field = models.CharField(max_length=255)
+    term = models.CharField(max_length=255)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['form_template', 'field', 'term'], name='core_search_field_term_idx'),
+            models.Index(fields=['form_template', 'term'], name='core_search_term_idx'),
+        ]
+
+class ChunkedUpload(models.Model):
+    """A file sent to the public form in chunks ahead of the submission that references it (see core.chunked_uploads)."""
+    upload_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    form_template = models.ForeignKey(FormTemplate, on_delete=models.CASCADE, related_name='+')
+    field = models.CharField(max_length=255)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    # Bytes received so far; the next chunk must start here
+    offset = models.PositiveBigIntegerField(default=0)
+    # SHA-256 of the whole file as declared by the client, checked on completion
+    sha256 = models.CharField(max_length=64, blank=True, default='')
+    # Storage name of the assembled file once the upload is complete
+    stored_name = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+class CardExport(models.Model):
+    """A print-ready ID card PDF of a form, rendered by the photo workers rather than in a request (see core.tasks)."""
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    form_template = models.ForeignKey(FormTemplate, on_delete=models.CASCADE, related_name='+')
+    sheet = models.CharField(max_length=10)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    cards = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='card_exports/', blank=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
@@ -0,0 +1,37 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(submission):
+    raw = f'{submission.submitted_at.isoformat()}|{submission.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns (submitted_at, id) from a cursor, or None if it is missing or malformed."""
+    try:
+        submitted_at, submission_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(submitted_at), int(submission_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def paginate_submissions(submissions, cursor, page_size):
+    """
+    Keyset pagination over submissions, newest first. Each page seeks past the last
+    (submitted_at, id) seen instead of using OFFSET, so every page costs the same.
+    Returns (page, next_cursor); next_cursor is None on the last page.
+    """
+    submissions = submissions.order_by('-submitted_at', '-id')
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        submitted_at, submission_id = position
+        submissions = submissions.filter(
+            Q(submitted_at__lt=submitted_at) | Q(submitted_at=submitted_at, id__lt=submission_id)
+        )
+
+    page = list(submissions[:page_size + 1])
+    next_cursor = encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+    return page[:page_size], next_cursor
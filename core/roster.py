@@ -0,0 +1,171 @@
+import io
+import csv
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+from django.db.models.fields.json import KeyTextTransform
+
+from .models import FormTemplate, StudentSubmission, SubmissionSearchTerm
+from .search import build_terms
+from .validation import compile_validator
+
+ROLL_NUMBER_FIELD = 'Roll Number'
+ROSTER_CHUNK_SIZE = 500
+
+# Same expressions as the core_sub_roll_number_idx index (migration 0011), so lookups by roll number use it
+_ROLL_NUMBER_SQL = {
+    'sqlite': 'json_extract("core_studentsubmission"."data", \'$."Roll Number"\')',
+    'postgresql': '("core_studentsubmission"."data" ->> \'Roll Number\')',
+}
+
+
+class RosterError(ValueError):
+    """Raised when a roster file can't be imported at all, e.g. it has no Roll Number column."""
+
+
+@dataclass
+class RosterResult:
+    created: int = 0
+    updated: int = 0
+    seconds: float = 0.0
+    errors: list = field(default_factory=list)  # (line number, message)
+
+    @property
+    def rows_per_second(self):
+        return (self.created + self.updated) / self.seconds if self.seconds else 0.0
+
+
+class RosterRow(dict):
+    """A roster row with the QueryDict methods SubmissionValidator uses; checkbox cells hold comma-separated options."""
+
+    def getlist(self, key):
+        return [value.strip() for value in (self.get(key) or '').split(',') if value.strip()]
+
+
+def roll_number_expression():
+    sql = _ROLL_NUMBER_SQL.get(connection.vendor)
+    return RawSQL(sql, ()) if sql else KeyTextTransform(ROLL_NUMBER_FIELD, 'data')
+
+
+def submissions_by_roll_number(form_template, roll_numbers):
+    submissions = StudentSubmission.objects.filter(form_template=form_template).annotate(
+        roll_number=roll_number_expression(),
+    ).filter(roll_number__in=roll_numbers)
+    return {submission.roll_number: submission for submission in submissions}
+
+
+def find_roster_submission(form_template, roll_number):
+    """The imported record still waiting for this student's photo, if there is one."""
+    if not roll_number:
+        return None
+    submission = submissions_by_roll_number(form_template, [roll_number]).get(roll_number)
+    if submission is not None and submission.processing_status == StudentSubmission.STATUS_AWAITING_PHOTO:
+        return submission
+    return None
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.date().isoformat() if isinstance(value, datetime) else value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))  # Spreadsheets store typed numbers like roll numbers as floats
+    return str(value).strip()
+
+
+def read_roster(file, name):
+    """Yields (line number, RosterRow) from a CSV or XLSX file one row at a time."""
+    if name.lower().endswith('.xlsx'):
+        from openpyxl import load_workbook
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [_cell(value) for value in next(rows, ())]
+            for line, values in enumerate(rows, start=2):
+                if any(value not in (None, '') for value in values):
+                    yield line, RosterRow(zip(header, (_cell(value) for value in values)))
+        finally:
+            workbook.close()
+    elif name.lower().endswith('.csv'):
+        reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+        for line, row in enumerate(reader, start=2):
+            yield line, RosterRow((key.strip(), (value or '').strip()) for key, value in row.items() if key)
+    else:
+        raise RosterError('The roster must be a .csv or .xlsx file.')
+
+
+def _import_chunk(form_template, validator, file_fields, chunk, result):
+    rows = {}
+    for line, row in chunk:
+        data, _, errors = validator.validate(row, {})
+        # Files can't come from a roster; students upload them with their photo
+        errors = {name: error for name, error in errors.items() if name not in file_fields}
+        if errors:
+            result.errors.append((line, ' '.join(f'{name}: {error}' for name, error in errors.items())))
+            continue
+        if not data.get(ROLL_NUMBER_FIELD):
+            result.errors.append((line, f'{ROLL_NUMBER_FIELD} is required.'))
+            continue
+        rows[data[ROLL_NUMBER_FIELD]] = data  # A repeated roll number within the file: the last row wins
+
+    if not rows:
+        return
+
+    with transaction.atomic():
+        existing = submissions_by_roll_number(form_template, list(rows))
+        to_create, to_update = [], []
+        for roll_number, data in rows.items():
+            submission = existing.get(roll_number)
+            if submission is None:
+                to_create.append(StudentSubmission(
+                    form_template=form_template, data=data, processing_status=StudentSubmission.STATUS_AWAITING_PHOTO,
+                ))
+            else:
+                # Keep anything the roster has no value for, like files the student already uploaded
+                submission.data = {**submission.data, **{k: v for k, v in data.items() if v not in (None, '', [])}}
+                to_update.append(submission)
+
+        StudentSubmission.objects.bulk_create(to_create)
+        StudentSubmission.objects.bulk_update(to_update, ['data'])
+
+        # bulk_create/bulk_update don't send signals, so the search index and the form's count are updated here
+        SubmissionSearchTerm.objects.filter(submission__in=to_update).delete()
+        SubmissionSearchTerm.objects.bulk_create(
+            [term for submission in to_create + to_update for term in build_terms(submission)], batch_size=1000,
+        )
+        if to_create:
+            FormTemplate.objects.filter(id=form_template.id).update(submission_count=F('submission_count') + len(to_create))
+
+    result.created += len(to_create)
+    result.updated += len(to_update)
+
+
+def import_roster(form_template, file, name, chunk_size=ROSTER_CHUNK_SIZE):
+    """
+    Creates or updates submissions from a roster file, matched on Roll Number. Rows are validated against the
+    form's fields and written in chunks, each in its own transaction; imported students await their photo.
+    """
+    started = time.monotonic()
+    validator = compile_validator(form_template)
+    file_fields = {f['name'] for f in form_template.form_fields if f.get('type') == 'file'}
+    if ROLL_NUMBER_FIELD not in {f['name'] for f in form_template.form_fields}:
+        raise RosterError(f'The form has no "{ROLL_NUMBER_FIELD}" field to match students on.')
+
+    result = RosterResult()
+    chunk = []
+    for index, (line, row) in enumerate(read_roster(file, name)):
+        if index == 0 and ROLL_NUMBER_FIELD not in row:
+            raise RosterError(f'The roster has no "{ROLL_NUMBER_FIELD}" column.')
+        chunk.append((line, row))
+        if len(chunk) >= chunk_size:
+            _import_chunk(form_template, validator, file_fields, chunk, result)
+            chunk = []
+    _import_chunk(form_template, validator, file_fields, chunk, result)
+
+    result.seconds = time.monotonic() - started
+    return result
@@ -0,0 +1,90 @@
+import re
+import unicodedata
+
+from django.db import transaction
+
+from .models import SubmissionSearchTerm
+
+MAX_TERM_LENGTH = 255
+# Upper bound for prefix range scans: sorts after every character used in normal text
+_PREFIX_END = '\uffff'
+_FIELD_FILTER_RE = re.compile(r'^(?P<field>[^=:]+?)\s*(?P<op>[=:])\s*(?P<value>.+)$')
+
+
+def normalize(value):
+    """Lower-cases, strips accents and collapses whitespace so lookups are case/accent-insensitive."""
+    value = unicodedata.normalize('NFKD', str(value))
+    value = ''.join(c for c in value if not unicodedata.combining(c))
+    return ' '.join(value.casefold().split())[:MAX_TERM_LENGTH]
+
+
+def terms_for_data(data):
+    """(field, term) pairs for a submission: the whole normalized value plus each word in it."""
+    terms = set()
+    for field, value in (data or {}).items():
+        values = value if isinstance(value, list) else [value]
+        for item in values:
+            if item is None or item == '':
+                continue
+            full = normalize(item)
+            if not full:
+                continue
+            terms.add((field, full))
+            terms.update((field, word) for word in re.findall(r'\w+', full))
+    return terms
+
+
+def build_terms(submission):
+    return [
+        SubmissionSearchTerm(form_template_id=submission.form_template_id, submission_id=submission.id, field=field, term=term)
+        for field, term in terms_for_data(submission.data)
+    ]
+
+
+def index_submission(submission):
+    """Replaces the stored search terms of a submission with terms for its current data."""
+    with transaction.atomic():
+        SubmissionSearchTerm.objects.filter(submission_id=submission.id).delete()
+        SubmissionSearchTerm.objects.bulk_create(build_terms(submission))
+
+
+def _matching_ids(form_template, term, field=None, exact=False):
+    terms = SubmissionSearchTerm.objects.filter(form_template=form_template)
+    if field is not None:
+        terms = terms.filter(field=field)
+    if exact:
+        terms = terms.filter(term=term)
+    else:
+        # A range scan rather than LIKE, so the (form_template, field, term) index is used on every backend
+        terms = terms.filter(term__gte=term, term__lt=term + _PREFIX_END)
+    return terms.values('submission_id')
+
+
+def parse_query(form_template, query):
+    """
+    Splits a search query into (field, value, exact) conditions. Parts are separated by ';':
+      "Roll Number = 23"  exact match on a field
+      "Full Name: ama"    prefix match on a field
+      anything else       every word must prefix-match some field
+    """
+    field_names = {normalize(f.get('name')): f.get('name') for f in form_template.form_fields if f.get('name')}
+    conditions = []
+    for part in query.split(';'):
+        part = part.strip()
+        if not part:
+            continue
+        match = _FIELD_FILTER_RE.match(part)
+        if match and normalize(match['field']) in field_names:
+            value = normalize(match['value'])
+            if value:
+                conditions.append((field_names[normalize(match['field'])], value, match['op'] == '='))
+            continue
+        conditions.extend((None, word, False) for word in re.findall(r'\w+', normalize(part)))
+    return conditions
+
+
+def search_submissions(form_template, query, submissions):
+    """Narrows a submissions queryset to the rows matching every condition of the query."""
+    for field, value, exact in parse_query(form_template, query):
+        submissions = submissions.filter(id__in=_matching_ids(form_template, value, field=field, exact=exact))
+    return submissions
@@ -0,0 +1,130 @@
+import os
+import time
+import logging
+import threading
+
+import numpy as np
+from PIL import Image
+from django.conf import settings
+from rembg import new_session
+
+logger = logging.getLogger(__name__)
+
+# One rembg session per model name, shared by every photo-processing call site in the process
+_sessions = {}
+_session_stats = {}
+_lock = threading.Lock()
+
+
+def _forget_sessions():
+    """
+    ONNX Runtime sessions aren't fork-safe, so a forked child (Celery prefork, ProcessPoolExecutor) never uses
+    one loaded by its parent; it loads its own on first use, after its initializer has set the thread count.
+    """
+    global _lock
+    _sessions.clear()
+    _session_stats.clear()
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_sessions)
+
+# Models that share rembg's U2-Net pre/post-processing, so several images can go through one inference call
+BATCHABLE_MODELS = {'u2net', 'u2netp', 'u2net_human_seg', 'silueta'}
+_U2NET_MEAN = (0.485, 0.456, 0.406)
+_U2NET_STD = (0.229, 0.224, 0.225)
+_U2NET_SIZE = (320, 320)
+_unbatchable_models = set()
+
+
+def _resident_memory_bytes():
+    """Current resident set size of this process, or None where it can't be read."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def get_session(model_name=None):
+    """
+    Returns the warm rembg session for a model, loading it on first use.
+    Loading resolves (and if needed downloads) the ONNX model, so it only ever happens once per process.
+    """
+    model_name = model_name or settings.REMBG_MODEL
+    session = _sessions.get(model_name)
+    if session is not None:
+        return session
+
+    with _lock:
+        if model_name not in _sessions:
+            rss_before = _resident_memory_bytes()
+            started = time.perf_counter()
+            _sessions[model_name] = new_session(model_name)
+            load_seconds = time.perf_counter() - started
+            rss_after = _resident_memory_bytes()
+
+            memory_bytes = None
+            if rss_before is not None and rss_after is not None:
+                memory_bytes = max(0, rss_after - rss_before)
+            _session_stats[model_name] = {
+                'model': model_name,
+                'pid': os.getpid(),
+                'load_seconds': round(load_seconds, 3),
+                'memory_bytes': memory_bytes,
+            }
+            logger.info("Loaded rembg model %s in %.2fs (~%s bytes)", model_name, load_seconds, memory_bytes)
+        return _sessions[model_name]
+
+
+def preload(model_names=None):
+    """Eagerly loads the given models (default: REMBG_PRELOAD_MODELS) so the first submission isn't slow."""
+    for model_name in model_names or settings.REMBG_PRELOAD_MODELS:
+        get_session(model_name)
+
+
+def init_worker():
+    """ProcessPoolExecutor initializer for photo work: loads the model once per process before the first job."""
+    # Each process runs its own ONNX session; keep them from oversubscribing the cores between them.
+    # rembg reads this when it creates the session, which happens below since sessions aren't inherited.
+    os.environ.setdefault('OMP_NUM_THREADS', '1')
+    preload()
+
+
+def session_stats():
+    """Load time and approximate memory footprint of every model loaded in this process."""
+    return list(_session_stats.values())
+
+
+def _predict_masks_batched(session, images):
+    """Runs the U2-Net forward pass once for the whole batch, mirroring rembg's U2netSession.predict."""
+    inputs = [session.normalize(image, _U2NET_MEAN, _U2NET_STD, _U2NET_SIZE) for image in images]
+    input_name = next(iter(inputs[0]))
+    batch = np.concatenate([i[input_name] for i in inputs], axis=0)
+    predictions = session.inner_session.run(None, {input_name: batch})[0][:, 0, :, :]
+
+    masks = []
+    for pred, image in zip(predictions, images):
+        pred = (pred - pred.min()) / (pred.max() - pred.min())
+        mask = Image.fromarray((pred * 255).astype('uint8'), mode='L')
+        masks.append(mask.resize(image.size, Image.LANCZOS))
+    return masks
+
+
+def predict_masks(images, model_name=None):
+    """
+    Returns one segmentation mask per image.
+    U2-Net family models are run as a single batched inference; models that can't be batched
+    (or whose exported graph has a fixed batch size) fall back to one call per image.
+    """
+    model_name = model_name or settings.REMBG_MODEL
+    session = get_session(model_name)
+
+    if len(images) > 1 and model_name in BATCHABLE_MODELS and model_name not in _unbatchable_models:
+        try:
+            return _predict_masks_batched(session, images)
+        except Exception as e:
+            logger.warning("Batched inference unavailable for %s, falling back to single images: %s", model_name, e)
+            _unbatchable_models.add(model_name)
+
+    return [session.predict(image)[0] for image in images]
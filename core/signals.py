@@ -0,0 +1,42 @@
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .form_cache import invalidate_form
+from .models import FormTemplate, StudentSubmission
+from .search import index_submission
+
+
+@receiver(post_save, sender=StudentSubmission)
+def update_search_index(sender, instance, created, update_fields=None, **kwargs):
+    # Photo processing saves with update_fields that don't touch data; skip re-indexing for those
+    if update_fields is not None and 'data' not in update_fields:
+        return
+    index_submission(instance)
+
+
+@receiver(post_save, sender=StudentSubmission)
+def increment_submission_count(sender, instance, created, **kwargs):
+    if created:
+        FormTemplate.objects.filter(id=instance.form_template_id).update(submission_count=F('submission_count') + 1)
+
+
+@receiver(post_delete, sender=StudentSubmission)
+def decrement_submission_count(sender, instance, **kwargs):
+    FormTemplate.objects.filter(id=instance.form_template_id, submission_count__gt=0).update(submission_count=F('submission_count') - 1)
+
+
+@receiver(post_save, sender=FormTemplate)
+@receiver(post_delete, sender=FormTemplate)
+def invalidate_cached_form(sender, instance, **kwargs):
+    invalidate_form(instance.slug)
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    # WAL lets admin reads proceed while a submission is being written; NORMAL sync is safe in WAL mode
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
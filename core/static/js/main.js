@@ -13,6 +13,82 @@ document.addEventListener('DOMContentLoaded', function () {
     let cropper;
     let croppedBlob = null;
 
+    // Attachments are uploaded in resumable chunks as soon as they are chosen; submitting the form
+    // then only sends the text fields and the upload ids.
+    const uploadsUrl = form.dataset.uploadsUrl;
+    const MAX_RETRIES = 6;
+    const uploads = {}; // field name -> {blob, filename, promise of the upload id}
+
+    async function sha256Hex(blob) {
+        // crypto.subtle only exists on secure origins; the server treats checksums as optional
+        if (!window.crypto || !crypto.subtle) return '';
+        const hash = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+        return Array.from(new Uint8Array(hash)).map(b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    async function requestJson(url, options) {
+        const response = await fetch(url, options);
+        return { response, data: await response.json() };
+    }
+
+    async function uploadFile(field, blob, filename) {
+        const start = await requestJson(uploadsUrl, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ field, filename, size: blob.size, sha256: await sha256Hex(blob) }),
+        });
+        if (!start.response.ok) throw new Error(start.data.message);
+
+        const uploadUrl = `${uploadsUrl}${start.data.upload_id}/`;
+        let offset = 0;
+        let failures = 0;
+        while (offset < blob.size) {
+            const chunk = blob.slice(offset, offset + start.data.chunk_size);
+            try {
+                const { response, data } = await requestJson(`${uploadUrl}?offset=${offset}`, {
+                    method: 'PUT',
+                    headers: { 'X-Chunk-SHA256': await sha256Hex(chunk) },
+                    body: chunk,
+                });
+                if (response.ok) {
+                    offset = data.offset;
+                    failures = 0;
+                    continue;
+                }
+            } catch (error) {
+                // Network error: retried below
+            }
+            if (++failures > MAX_RETRIES) throw new Error(`Uploading ${filename} keeps failing. Please check your connection.`);
+            await new Promise(resolve => setTimeout(resolve, 500 * 2 ** failures));
+            try {
+                // Resume from whatever the server actually received
+                offset = (await requestJson(uploadUrl)).data.offset;
+            } catch (error) {
+                // Still offline; the next attempt resends from the last known offset
+            }
+        }
+
+        const done = await requestJson(`${uploadUrl}complete/`, { method: 'POST' });
+        if (!done.response.ok) throw new Error(done.data.message);
+        return done.data.upload_id;
+    }
+
+    function startUpload(field, blob, filename) {
+        const entry = { blob, filename, promise: uploadFile(field, blob, filename) };
+        entry.promise.catch(() => {}); // Failures are reported when the form is submitted
+        uploads[field] = entry;
+    }
+
+    form.querySelectorAll('input[type="file"][name]').forEach(input => {
+        input.addEventListener('change', () => {
+            if (input.files[0]) {
+                startUpload(input.name, input.files[0], input.files[0].name);
+            } else {
+                delete uploads[input.name];
+            }
+        });
+    });
+
     photoInput.addEventListener('change', (e) => {
         const file = e.target.files[0];
         if (file) {
@@ -44,6 +120,7 @@ document.addEventListener('DOMContentLoaded', function () {
                 imageSmoothingQuality: 'high',
             }).toBlob((blob) => {
                 croppedBlob = blob;
+                startUpload('photo', blob, 'photo.jpg');
                 const url = URL.createObjectURL(blob);
                 preview.innerHTML = `<img src="${url}" class="w-full h-full object-cover rounded-full">`;
                 modal.style.display = 'none';
@@ -52,7 +129,13 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     });
 
-    form.addEventListener('submit', function (e) {
+    function resetSubmitButton() {
+        submitBtn.disabled = false;
+        submitBtn.textContent = 'Submit Details';
+        loader.style.display = 'none';
+    }
+
+    form.addEventListener('submit', async function (e) {
         e.preventDefault();
 
         if (!croppedBlob) {
@@ -65,9 +148,19 @@ document.addEventListener('DOMContentLoaded', function () {
         loader.style.display = 'block';
 
         const formData = new FormData(form);
-        formData.append('photo', croppedBlob, 'photo.jpg');
+        try {
+            for (const [field, entry] of Object.entries(uploads)) {
+                // An upload that failed earlier gets one more attempt now
+                entry.promise = entry.promise.catch(() => uploadFile(field, entry.blob, entry.filename));
+                formData.set(field, await entry.promise);
+            }
+        } catch (error) {
+            alert('An error occurred: ' + error.message);
+            resetSubmitButton();
+            return;
+        }
 
-        fetch(window.location.href, {
+        fetch(form.getAttribute('action') || window.location.href, {
             method: 'POST',
             body: formData,
         })
@@ -77,17 +170,13 @@ document.addEventListener('DOMContentLoaded', function () {
                 window.location.href = data.redirect_url;
             } else {
                 alert('An error occurred: ' + data.message);
-                submitBtn.disabled = false;
-                submitBtn.textContent = 'Submit Details';
-                loader.style.display = 'none';
+                resetSubmitButton();
             }
         })
         .catch(error => {
             console.error('Error:', error);
             alert('A network error occurred. Please try again.');
-            submitBtn.disabled = false;
-            submitBtn.textContent = 'Submit Details';
-            loader.style.display = 'none';
+            resetSubmitButton();
         });
     });
 });
\ No newline at end of file
@@ -0,0 +1,349 @@
+import logging
+from datetime import timedelta
+
+from PIL import Image
+from celery import shared_task
+from celery.signals import worker_process_init
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .cards import build_card_export
+from .derivatives import content_digest, pregenerate_derivatives
+from .image_processing import (
+    PhotoRejected, apply_background, cut_out_subjects, cutout_photo_name, encode_jpeg, encode_png, load_photo,
+    processed_photo_name, segment_photo,
+)
+from .metrics import timer
+from .models import CardExport, StudentSubmission
+from .segmentation import preload
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_photo_processing(submission):
+    """
+    Hands a saved submission over to the photo workers.
+    With a Celery broker configured the job is published once the transaction commits;
+    otherwise the row simply stays 'pending' and `manage.py run_photo_worker` picks it up.
+    """
+    if settings.CELERY_BROKER_URL:
+        transaction.on_commit(lambda: process_submission_photo.delay(submission.id))
+
+
+def requeue_submissions(submissions):
+    """
+    Puts existing submissions back on the photo queue, e.g. after their form's background changed.
+    Rows a worker is processing right now are left alone, so two jobs never write the same photo;
+    their claims are only taken over once stale, as in claim_submission.
+    """
+    requeue = StudentSubmission.objects.filter(id__in=submissions.values('id')).exclude(
+        processing_status=StudentSubmission.STATUS_PROCESSING, processing_started_at__gte=_stale_cutoff(),
+    )
+    submission_ids = list(requeue.values_list('id', flat=True))
+    # Filtered again on update, in case a worker claimed one of the rows in between
+    requeued = requeue.filter(id__in=submission_ids).update(
+        processing_status=StudentSubmission.STATUS_PENDING, processing_attempts=0, processing_error='', next_attempt_at=None,
+    )
+    if settings.CELERY_BROKER_URL:
+        transaction.on_commit(lambda: [process_submission_photo.delay(i) for i in submission_ids])
+    return requeued
+
+
+def retry_delay(attempts):
+    """Seconds before a job that failed attempts times runs again: PHOTO_PROCESSING_RETRY_DELAY, doubling per attempt."""
+    return settings.PHOTO_PROCESSING_RETRY_DELAY * 2 ** max(0, attempts - 1)
+
+
+def _stale_cutoff():
+    return timezone.now() - timedelta(seconds=settings.PHOTO_PROCESSING_STALE_AFTER)
+
+
+def claim_submission(submission_id, statuses=(StudentSubmission.STATUS_PENDING,)):
+    """
+    Atomically moves a submission in one of statuses to 'processing'. Returns False if another worker got it first.
+    A claim older than PHOTO_PROCESSING_STALE_AFTER is taken over, so a job redelivered after its worker died
+    (Celery acks late) runs again instead of finding its own abandoned claim.
+    """
+    stale = Q(processing_status=StudentSubmission.STATUS_PROCESSING, processing_started_at__lt=_stale_cutoff())
+    return StudentSubmission.objects.filter(
+        Q(processing_status__in=statuses) | stale, id=submission_id,
+    ).update(
+        processing_status=StudentSubmission.STATUS_PROCESSING,
+        processing_started_at=timezone.now(),
+        processing_attempts=F('processing_attempts') + 1,
+    ) == 1
+
+
+def release_claim(submission_id, error):
+    """
+    Puts a claimed job whose run raised back to 'pending', or marks it 'failed' once it has used up
+    PHOTO_PROCESSING_MAX_ATTEMPTS. Returns the new status, or None if the row is no longer claimed.
+    """
+    attempts = StudentSubmission.objects.filter(id=submission_id).values_list('processing_attempts', flat=True).first()
+    if attempts is None:
+        return None
+    if attempts < settings.PHOTO_PROCESSING_MAX_ATTEMPTS:
+        status = StudentSubmission.STATUS_PENDING
+    else:
+        status = StudentSubmission.STATUS_FAILED
+    released = StudentSubmission.objects.filter(
+        id=submission_id, processing_status=StudentSubmission.STATUS_PROCESSING,
+    ).update(
+        processing_status=status, processing_error=error,
+        next_attempt_at=timezone.now() + timedelta(seconds=retry_delay(attempts)),
+    )
+    return status if released else None
+
+
+def release_stale_claims():
+    """Returns jobs whose worker died mid-processing back to the queue."""
+    return StudentSubmission.objects.filter(
+        processing_status=StudentSubmission.STATUS_PROCESSING, processing_started_at__lt=_stale_cutoff(),
+    ).update(processing_status=StudentSubmission.STATUS_PENDING)
+
+
+def load_cutout(submission):
+    """The stored background-free cut-out of a submission, or None if it hasn't been segmented yet."""
+    if not submission.cutout_photo:
+        return None
+    try:
+        return Image.open(submission.cutout_photo).convert("RGBA")
+    except Exception as e:
+        logger.warning("Could not open cut-out for submission %s: %s", submission.id, e)
+        return None
+
+
+def reuse_earlier_result(submission):
+    """
+    Skips background removal for a photo that was uploaded before (same original_sha256).
+    If an earlier submission was composited onto the same background its processed photo is shared and True
+    is returned; otherwise only its cut-out is taken over, leaving just the compositing to do.
+    """
+    if not submission.original_sha256 or submission.cutout_photo:
+        return False
+    twins = StudentSubmission.objects.filter(
+        original_sha256=submission.original_sha256, processing_status=StudentSubmission.STATUS_DONE,
+    ).exclude(id=submission.id).exclude(cutout_photo='').exclude(cutout_photo__isnull=True)
+
+    signature = submission.form_template.background_signature()
+    twin = twins.filter(processed_background=signature).exclude(processed_photo='').first()
+    if twin is not None:
+        submission.cutout_photo = twin.cutout_photo.name
+        submission.processed_photo = twin.processed_photo.name
+        submission.processed_photo_digest = twin.processed_photo_digest
+        submission.processed_background = signature
+        submission.processing_status = StudentSubmission.STATUS_DONE
+        submission.processing_error = ''
+        submission.save(update_fields=[
+            'cutout_photo', 'processed_photo', 'processed_photo_digest', 'processed_background',
+            'processing_status', 'processing_error',
+        ])
+        logger.info("Reused processed photo of submission %s for submission %s", twin.id, submission.id)
+        return True
+
+    twin = twins.first()
+    if twin is not None:
+        submission.cutout_photo = twin.cutout_photo.name
+        submission.save(update_fields=['cutout_photo'])
+        logger.info("Reused cut-out of submission %s for submission %s", twin.id, submission.id)
+    return False
+
+
+def save_processed_photo(submission, cutout):
+    """Composites a cut-out onto the form's background and stores both on the submission."""
+    update_fields = ['processed_photo', 'processed_photo_digest', 'processing_status', 'processing_error', 'processed_background']
+    if not submission.cutout_photo:
+        cutout_file = encode_png(cutout, cutout_photo_name(submission.original_photo.name))
+        submission.cutout_photo.save(cutout_file.name, cutout_file, save=False)
+        update_fields.append('cutout_photo')
+
+    final_image = apply_background(cutout, submission.form_template)
+    processed_photo_file = encode_jpeg(final_image, processed_photo_name(submission.original_photo.name))
+    submission.processed_photo_digest = content_digest(processed_photo_file)
+    submission.processed_photo.save(processed_photo_file.name, processed_photo_file, save=False)
+    submission.processing_status = StudentSubmission.STATUS_DONE
+    submission.processing_error = ''
+    submission.processed_background = submission.form_template.background_signature()
+    submission.save(update_fields=update_fields)
+    pregenerate_derivatives(submission, final_image)
+
+
+def run_photo_job(submission_id):
+    """
+    Processes the photo of one submission and records the outcome on the row.
+    Returns the resulting status; 'pending' means the job failed but will be retried.
+    """
+    if not claim_submission(submission_id):
+        return None
+
+    submission = StudentSubmission.objects.select_related('form_template').get(id=submission_id)
+    if reuse_earlier_result(submission):
+        return submission.processing_status
+
+    cutout = load_cutout(submission)
+    rejected = None
+    if cutout is None:
+        try:
+            cutout = segment_photo(submission.original_photo)
+        except PhotoRejected as e:
+            rejected = e
+
+    if cutout is not None:
+        save_processed_photo(submission, cutout)
+    else:
+        # A rejected photo fails the same way every time, so it isn't retried
+        if rejected is None and submission.processing_attempts < settings.PHOTO_PROCESSING_MAX_ATTEMPTS:
+            submission.processing_status = StudentSubmission.STATUS_PENDING
+            submission.next_attempt_at = timezone.now() + timedelta(seconds=retry_delay(submission.processing_attempts))
+        else:
+            submission.processing_status = StudentSubmission.STATUS_FAILED
+        submission.processing_error = str(rejected) if rejected else 'Background removal failed.'
+        submission.save(update_fields=['processing_status', 'processing_error', 'next_attempt_at'])
+        logger.warning("Photo processing failed for submission %s (attempt %s)", submission_id, submission.processing_attempts)
+
+    return submission.processing_status
+
+
+# Statuses reprocessing may take a submission from; 'processing' rows belong to a running job and are skipped
+REPROCESSABLE_STATUSES = (StudentSubmission.STATUS_PENDING, StudentSubmission.STATUS_DONE, StudentSubmission.STATUS_FAILED)
+
+
+def _record_failure(submission, error):
+    submission.processing_status = StudentSubmission.STATUS_FAILED
+    submission.processing_error = error
+    submission.save(update_fields=['processing_status', 'processing_error'])
+
+
+def reprocess_batch(submission_ids):
+    """
+    Regenerates processed photos for a batch of submissions.
+    Each row is claimed first, so a photo worker or Celery task never works on the same submission at the same time.
+    Submissions with a stored cut-out are only re-composited; the rest are segmented together in a single
+    inference call. A failure is recorded on its row and doesn't stop the batch. Returns (processed, failed) counts.
+    """
+    claimed = [i for i in submission_ids if claim_submission(i, REPROCESSABLE_STATUSES)]
+    submissions = StudentSubmission.objects.select_related('form_template').filter(id__in=claimed)
+    to_segment, images, failed, processed = [], [], 0, 0
+    for submission in submissions:
+        cutout = load_cutout(submission)
+        if cutout is None:
+            try:
+                images.append(load_photo(submission.original_photo))
+                to_segment.append(submission)
+            except Exception as e:
+                logger.warning("Could not open original photo for submission %s: %s", submission.id, e)
+                _record_failure(submission, 'Could not open the original photo.')
+                failed += 1
+            continue
+        try:
+            save_processed_photo(submission, cutout)
+            processed += 1
+        except Exception:
+            logger.exception("Re-compositing failed for submission %s", submission.id)
+            _record_failure(submission, 'Compositing the photo failed.')
+            failed += 1
+
+    cutouts = []
+    if images:
+        try:
+            cutouts = cut_out_subjects(images)
+        except Exception:
+            logger.exception("Background removal failed for a batch of %s photo(s)", len(images))
+    for index, submission in enumerate(to_segment):
+        if index >= len(cutouts):
+            _record_failure(submission, 'Background removal failed.')
+            failed += 1
+            continue
+        try:
+            save_processed_photo(submission, cutouts[index])
+            processed += 1
+        except Exception:
+            logger.exception("Saving the processed photo failed for submission %s", submission.id)
+            _record_failure(submission, 'Saving the processed photo failed.')
+            failed += 1
+
+    return processed, failed
+
+
+def start_card_export(form_template, sheet):
+    """
+    Queues an ID card PDF of a form. An export of the same sheet size that is still queued or rendering is returned
+    instead of starting another; finished ones are replaced, so each form keeps at most one file per sheet size.
+    """
+    active = CardExport.objects.filter(
+        form_template=form_template, sheet=sheet,
+        status__in=[CardExport.STATUS_PENDING, CardExport.STATUS_PROCESSING],
+    ).first()
+    if active is not None:
+        return active
+    for old in CardExport.objects.filter(form_template=form_template, sheet=sheet):
+        if old.file:
+            old.file.delete(save=False)
+        old.delete()
+    export = CardExport.objects.create(form_template=form_template, sheet=sheet, cards=form_template.submission_count)
+    if settings.CELERY_BROKER_URL:
+        transaction.on_commit(lambda: render_card_export.delay(export.id))
+    return export
+
+
+def due_submissions():
+    """Pending submissions the database queue may run now, oldest first; failed jobs wait out their retry delay."""
+    return StudentSubmission.objects.filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now()),
+        processing_status=StudentSubmission.STATUS_PENDING,
+    ).order_by('submitted_at')
+
+
+def pending_card_exports():
+    """Queued exports, plus ones whose worker died mid-render (not finished after CARD_EXPORT_STALE_AFTER)."""
+    stale = Q(status=CardExport.STATUS_PROCESSING,
+              started_at__lt=timezone.now() - timedelta(seconds=settings.CARD_EXPORT_STALE_AFTER))
+    return CardExport.objects.filter(Q(status=CardExport.STATUS_PENDING) | stale)
+
+
+def run_card_export(export_id):
+    """Renders one card export and records the outcome; returns its status, or None if another worker has it."""
+    if not pending_card_exports().filter(id=export_id).update(
+        status=CardExport.STATUS_PROCESSING, started_at=timezone.now(),
+    ):
+        return None
+
+    export = CardExport.objects.select_related('form_template').get(id=export_id)
+    try:
+        with timer('export_seconds', format='cards_pdf'):
+            build_card_export(export)
+        export.status = CardExport.STATUS_DONE
+    except Exception:
+        logger.exception("Rendering card export %s failed", export_id)
+        export.status = CardExport.STATUS_FAILED
+        export.error = 'Rendering the ID cards failed.'
+    export.finished_at = timezone.now()
+    export.save()
+    return export.status
+
+
+@worker_process_init.connect
+def preload_segmentation_model(**kwargs):
+    # Each prefork child gets its own ONNX session; load it before the first task arrives
+    preload()
+
+
+@shared_task(bind=True, max_retries=None, acks_late=True)
+def process_submission_photo(self, submission_id):
+    try:
+        status = run_photo_job(submission_id)
+    except Exception:
+        # Without this the row would stay 'processing' and every retry would fail to claim it
+        logger.exception("Photo job for submission %s crashed", submission_id)
+        status = release_claim(submission_id, 'Photo processing crashed.')
+    if status == StudentSubmission.STATUS_PENDING:
+        attempts = StudentSubmission.objects.filter(id=submission_id).values_list('processing_attempts', flat=True).first()
+        raise self.retry(countdown=retry_delay(attempts or 1))
+    return status
+
+
+@shared_task(acks_late=True)
+def render_card_export(export_id):
+    return run_card_export(export_id)
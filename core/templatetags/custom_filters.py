@@ -1,5 +1,7 @@
 from django import template
 
+from core.derivatives import derivative_url
+
 register = template.Library()
 
 @register.filter(name='get_item')
@@ -10,4 +12,7 @@ def get_item(dictionary, key):
 @register.filter(name='is_list')
 def is_list(value):
     """Checks if a value is a list."""
-    return isinstance(value, list)
\ No newline at end of file
+    return isinstance(value, list)
+
+# {% derivative_url submission 'thumb' %}
+register.simple_tag(derivative_url)
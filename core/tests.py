@@ -0,0 +1,679 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.http import Http404
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .assets import PUBLIC_CSS_PATH, build_css, build_public_css, collect_classes
+from .blobs import store_blob
+from .checks import check_static_manifest
+from .chunked_uploads import append_chunk, complete_upload, discard_expired_uploads, partial_path, start_upload
+from .derivatives import derivative_name
+from .form_cache import get_form_template, get_rendered_form
+from .image_processing import load_photo
+from .metrics import render_prometheus
+from .models import CardExport, ChunkedUpload, FormTemplate, StudentSubmission
+from .pagination import paginate_submissions
+from .roster import RosterError, import_roster
+from .search import normalize, parse_query, search_submissions
+from .segmentation import get_session
+from .tasks import due_submissions, requeue_submissions, run_card_export, run_photo_job
+from .validation import compile_validator
+
+
+def create_form(admin, title, submissions=0):
+    form_template = FormTemplate.objects.create(admin=admin, title=title, form_fields=[{'name': 'Full Name', 'type': 'text'}])
+    for i in range(submissions):
+        StudentSubmission.objects.create(form_template=form_template, data={'Full Name': f'Student {i}'})
+    return form_template
+
+
+def use_temporary_media(test_case, **overrides):
+    """Points MEDIA_ROOT at a directory removed after the test, with the database photo queue instead of Celery."""
+    test_case.media_root = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, test_case.media_root, ignore_errors=True)
+    override = override_settings(MEDIA_ROOT=test_case.media_root, CELERY_BROKER_URL='', **overrides)
+    override.enable()
+    test_case.addCleanup(override.disable)
+
+
+def photo_upload(size, name='photo.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'white').save(buffer, format='JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class DashboardQueryTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='secret')
+        self.client.force_login(self.admin)
+
+    def test_query_count_does_not_grow_with_forms(self):
+        # Session, user, totals aggregate and the forms list; per-form counts come from submission_count
+        for i in range(3):
+            create_form(self.admin, f'Form {i}', submissions=2)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_submissions'], 6)
+
+        for i in range(3, 6):
+            create_form(self.admin, f'Form {i}', submissions=2)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_forms'], 6)
+        self.assertEqual(response.context['total_submissions'], 12)
+
+
+class SubmissionCountTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='secret')
+
+    def count(self, form_template):
+        form_template.refresh_from_db(fields=['submission_count'])
+        return form_template.submission_count
+
+    def test_count_follows_creates_and_deletes(self):
+        form_template = create_form(self.admin, 'Form', submissions=3)
+        self.assertEqual(self.count(form_template), 3)
+
+        form_template.submissions.first().delete()
+        self.assertEqual(self.count(form_template), 2)
+
+        # Saving an existing submission must not count it again
+        submission = form_template.submissions.first()
+        submission.data = {'Full Name': 'Renamed'}
+        submission.save()
+        self.assertEqual(self.count(form_template), 2)
+
+    def test_rebuild_submission_counts_corrects_drift(self):
+        form_template = create_form(self.admin, 'Form', submissions=2)
+        FormTemplate.objects.filter(id=form_template.id).update(submission_count=7)
+
+        call_command('rebuild_submission_counts', stdout=StringIO())
+        self.assertEqual(self.count(form_template), 2)
+
+
+class NumberValidationTests(TestCase):
+    def setUp(self):
+        admin = User.objects.create_user('admin', password='secret')
+        self.form_template = FormTemplate.objects.create(
+            admin=admin, title='Form', form_fields=[{'name': 'Roll Number', 'type': 'number', 'required': True}],
+        )
+
+    def errors(self, value):
+        _, _, errors = compile_validator(self.form_template).validate({'Roll Number': value}, {})
+        return errors
+
+    def test_accepts_numbers_as_typed(self):
+        for value in ('042', '3.5', '-7', '1e3'):
+            self.assertEqual(self.errors(value), {}, value)
+
+    def test_rejects_non_finite_values(self):
+        for value in ('NaN', 'nan', 'inf', '-Infinity', 'sNaN', 'abc'):
+            self.assertIn('Roll Number', self.errors(value), value)
+
+
+class PhotoProcessingTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        self.form_template = create_form(User.objects.create_user('admin', password='secret'), 'Form')
+
+    def test_rejected_photo_fails_without_retrying(self):
+        submission = StudentSubmission.objects.create(
+            form_template=self.form_template, data={}, original_photo=photo_upload((32, 32)),
+        )
+        self.assertEqual(run_photo_job(submission.id), StudentSubmission.STATUS_FAILED)
+        submission.refresh_from_db()
+        self.assertEqual(submission.processing_attempts, 1)
+        self.assertEqual(submission.processing_error, 'The photo is too small.')
+
+    @override_settings(PHOTO_PROCESSING_RETRY_DELAY=10, PHOTO_PROCESSING_MAX_ATTEMPTS=3)
+    def test_failed_jobs_back_off_before_the_queue_retries_them(self):
+        submission = StudentSubmission.objects.create(
+            form_template=self.form_template, data={}, original_photo=photo_upload((400, 400)),
+        )
+        with mock.patch('core.tasks.segment_photo', return_value=None):
+            for attempt, delay in ((1, 10), (2, 20)):
+                self.assertEqual(run_photo_job(submission.id), StudentSubmission.STATUS_PENDING)
+                submission.refresh_from_db()
+                self.assertAlmostEqual((submission.next_attempt_at - timezone.now()).total_seconds(), delay, delta=5)
+                # Not picked up again until the delay has passed
+                self.assertFalse(due_submissions().filter(id=submission.id).exists())
+                StudentSubmission.objects.filter(id=submission.id).update(next_attempt_at=timezone.now())
+                self.assertTrue(due_submissions().filter(id=submission.id).exists())
+            self.assertEqual(run_photo_job(submission.id), StudentSubmission.STATUS_FAILED)
+
+    @override_settings(PHOTO_MAX_OUTPUT_SIDE=1024)
+    def test_load_photo_caps_the_working_size(self):
+        self.assertEqual(load_photo(photo_upload((4000, 3000))).size, (1024, 768))
+        self.assertEqual(load_photo(photo_upload((800, 600))).size, (800, 600))
+
+
+class BenchmarkRegressionTests(TestCase):
+    """
+    Runs the benchmark command's database-side measurements (photo processing needs the rembg model) and fails
+    when exports stop streaming or submissions start failing. Limits are loose so slow CI machines pass.
+    """
+
+    def test_exports_stream_and_submissions_succeed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.json')
+            # More rows than one export chunk (EXPORT_CHUNK_SIZE), so buffering would show up as growth
+            call_command('benchmark', skip_photos=True, posts=5, rows='2000,6000', zip_photos=4, output=output,
+                         stdout=StringIO())
+            with open(output) as f:
+                report = json.load(f)
+
+        self.assertEqual(report['submission_post']['failed'], 0)
+        small, large = report['exports']
+        for export in ('csv', 'xlsx', 'zip'):
+            # Tripling the rows may not double peak memory
+            self.assertLess(large[export]['peak_bytes'], 2 * small[export]['peak_bytes'] + 64 * 1024, export)
+            self.assertGreater(large['rows'] / large[export]['seconds'], 2000, export)
+
+
+class CardExportTests(TestCase):
+    def setUp(self):
+        # The test database is in memory, so pages are rendered in this process
+        use_temporary_media(self, CARD_RENDER_WORKERS=1)
+        self.admin = User.objects.create_user('admin', password='secret')
+        self.client.force_login(self.admin)
+        self.form_template = create_form(self.admin, 'Form', submissions=3)
+
+    def test_export_is_rendered_by_a_worker_and_then_served(self):
+        response = self.client.get(reverse('export_cards', args=[self.form_template.id]) + '?sheet=card')
+        export = CardExport.objects.get()
+        self.assertRedirects(response, reverse('card_export', args=[export.id]), fetch_redirect_response=False)
+
+        # Until a worker has rendered it, the page waits instead of rendering in the request
+        self.assertContains(self.client.get(reverse('card_export', args=[export.id])), 'Rendering 3 ID cards')
+        # Asking again while it is queued doesn't queue a second export
+        self.client.get(reverse('export_cards', args=[self.form_template.id]) + '?sheet=card')
+        self.assertEqual(CardExport.objects.count(), 1)
+
+        self.assertEqual(run_card_export(export.id), CardExport.STATUS_DONE)
+        response = self.client.get(reverse('card_export', args=[export.id]))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+
+class ChunkedSubmissionTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        self.form_template = create_form(User.objects.create_user('admin', password='secret'), 'Form')
+
+    def test_submission_closes_completed_uploads(self):
+        photo = photo_upload((400, 400)).read()
+        upload = start_upload(self.form_template, 'photo', 'photo.jpg', len(photo))
+        append_chunk(upload, 0, BytesIO(photo), len(photo))
+        complete_upload(upload)
+
+        opened = []
+        def open_stored(*args, **kwargs):
+            opened.append(open_file(*args, **kwargs))
+            return opened[-1]
+        open_file = default_storage.open
+        with mock.patch.object(default_storage, 'open', side_effect=open_stored):
+            response = self.client.post(reverse('student_form_submit', args=[self.form_template.slug]),
+                                        {'photo': str(upload.upload_id), 'Full Name': 'Student'})
+
+        self.assertEqual(response.json()['status'], 'success', response.content)
+        self.assertEqual(StudentSubmission.objects.get().original_photo.name, upload.stored_name)
+        self.assertTrue(opened)
+        self.assertTrue(all(f.closed for f in opened))
+
+
+class BlobDedupTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        self.form_template = create_form(User.objects.create_user('admin', password='secret'), 'Form')
+
+    def submit(self, upload):
+        response = self.client.post(reverse('student_form_submit', args=[self.form_template.slug]),
+                                    {'photo': upload, 'Full Name': 'Student'})
+        self.assertEqual(response.json()['status'], 'success', response.content)
+        return StudentSubmission.objects.latest('id')
+
+    def test_identical_uploads_share_one_stored_file(self):
+        photo = photo_upload((400, 400)).read()
+        first = self.submit(SimpleUploadedFile('a.jpg', photo, content_type='image/jpeg'))
+        second = self.submit(SimpleUploadedFile('b.jpg', photo, content_type='image/jpeg'))
+
+        digest = hashlib.sha256(photo).hexdigest()
+        self.assertEqual(first.original_sha256, digest)
+        self.assertEqual(second.original_photo.name, first.original_photo.name)
+        self.assertEqual(first.original_photo.name, f'original_photos/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'original_photos', digest[:2])), [f'{digest}.jpg'])
+
+    def test_different_content_is_stored_separately(self):
+        first = self.submit(photo_upload((400, 400)))
+        second = self.submit(photo_upload((500, 400)))
+        self.assertNotEqual(first.original_photo.name, second.original_photo.name)
+        self.assertNotEqual(first.original_sha256, second.original_sha256)
+        for submission in (first, second):
+            with submission.original_photo.open('rb') as f:
+                self.assertEqual(hashlib.sha256(f.read()).hexdigest(), submission.original_sha256)
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        self.form_template = create_form(User.objects.create_user('admin', password='secret'), 'Form')
+        self.content = os.urandom(1000)
+
+    def start(self, sha256=''):
+        response = self.client.post(reverse('upload_start', args=[self.form_template.slug]), {
+            'field': 'photo', 'filename': 'photo.jpg', 'size': len(self.content), 'sha256': sha256,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['upload_id']
+
+    def put(self, upload_id, offset, data, **headers):
+        url = reverse('upload_chunk', args=[self.form_template.slug, upload_id]) + f'?offset={offset}'
+        return self.client.put(url, data, content_type='application/octet-stream', headers=headers)
+
+    def state(self, upload_id):
+        return self.client.get(reverse('upload_chunk', args=[self.form_template.slug, upload_id])).json()
+
+    def complete(self, upload_id):
+        return self.client.post(reverse('upload_complete', args=[self.form_template.slug, upload_id]))
+
+    def test_resumes_from_the_reported_offset(self):
+        upload_id = self.start()
+        self.assertEqual(self.put(upload_id, 0, self.content[:400]).json()['offset'], 400)
+        # A client that lost track asks where to continue from
+        self.assertEqual(self.state(upload_id)['offset'], 400)
+        self.put(upload_id, 400, self.content[400:])
+
+        state = self.complete(upload_id).json()
+        self.assertTrue(state['complete'])
+        upload = ChunkedUpload.objects.get(upload_id=upload_id)
+        with default_storage.open(upload.stored_name) as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(os.path.exists(partial_path(upload)))
+
+    def test_out_of_order_and_duplicate_chunks_are_refused(self):
+        upload_id = self.start()
+        response = self.put(upload_id, 400, self.content[400:800])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '0')
+
+        self.put(upload_id, 0, self.content[:400])
+        response = self.put(upload_id, 0, self.content[:400])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '400')
+        self.assertEqual(self.state(upload_id)['offset'], 400)
+
+    def test_chunk_failing_its_checksum_is_discarded(self):
+        upload_id = self.start()
+        response = self.put(upload_id, 0, self.content[:400], **{'X-Chunk-SHA256': hashlib.sha256(b'other').hexdigest()})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.state(upload_id)['offset'], 0)
+        self.assertEqual(os.path.getsize(partial_path(ChunkedUpload.objects.get(upload_id=upload_id))), 0)
+
+    def test_complete_checks_the_whole_file(self):
+        upload_id = self.start(sha256=hashlib.sha256(b'something else').hexdigest())
+        self.put(upload_id, 0, self.content)
+        self.assertEqual(self.complete(upload_id).status_code, 400)
+        self.assertFalse(ChunkedUpload.objects.get(upload_id=upload_id).stored_name)
+
+    def test_complete_refuses_missing_data(self):
+        upload_id = self.start()
+        self.put(upload_id, 0, self.content[:400])
+        self.assertEqual(self.complete(upload_id).status_code, 409)
+
+    @override_settings(CHUNKED_UPLOAD_EXPIRY=3600)
+    def test_expired_uploads_are_discarded(self):
+        expired, fresh = self.start(), self.start()
+        ChunkedUpload.objects.filter(upload_id=expired).update(created_at=timezone.now() - timedelta(hours=2))
+        path = partial_path(ChunkedUpload.objects.get(upload_id=expired))
+
+        self.assertEqual(discard_expired_uploads(), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(list(ChunkedUpload.objects.values_list('upload_id', flat=True)), [uuid.UUID(fresh)])
+
+
+class PublicAssetTests(TestCase):
+    def test_stylesheet_is_built_and_covers_every_class(self):
+        css, unsupported = build_public_css()
+        # A class without a rule would leave the page unstyled where it's used
+        self.assertEqual(unsupported, [])
+        with open(os.path.join(settings.BASE_DIR, PUBLIC_CSS_PATH), encoding='utf-8') as f:
+            self.assertEqual(f.read(), css, 'The committed stylesheet is out of date; run `python manage.py build_css`.')
+
+    def test_classes_without_rules_are_reported(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.html') as page:
+            page.write('<div class="p-4 {% if x %}bg-purple-500{% endif %}"></div><script>el.classList.add(\'grid-cols-7\');</script>')
+            page.flush()
+            classes = collect_classes([page.name])
+        self.assertEqual(classes, {'p-4', 'bg-purple-500', 'grid-cols-7'})
+        self.assertEqual(build_css(classes)[1], ['bg-purple-500', 'grid-cols-7'])
+
+    def test_public_pages_fit_the_byte_budget(self):
+        call_command('check_asset_budget', stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('check_asset_budget', budget=1024, stdout=StringIO())
+
+
+class StaticManifestCheckTests(TestCase):
+    def test_warns_until_collectstatic_has_run(self):
+        with tempfile.TemporaryDirectory() as static_root, override_settings(DEBUG=False, STATIC_ROOT=static_root):
+            self.assertEqual([w.id for w in check_static_manifest(None)], ['core.W001'])
+            call_command('collectstatic', interactive=False, verbosity=0)
+            self.assertEqual(check_static_manifest(None), [])
+
+
+class GcMediaTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        self.form_template = create_form(User.objects.create_user('admin', password='secret'), 'Form')
+
+    def blob(self, content, age=0):
+        name, _ = store_blob(SimpleUploadedFile('file.pdf', content), 'extra_uploads')
+        if age:
+            then = time.time() - age
+            os.utime(default_storage.path(name), (then, then))
+        return name
+
+    def gc(self, **options):
+        call_command('gc_media', stdout=StringIO(), **options)
+
+    def test_removes_old_orphans_only(self):
+        orphan = self.blob(b'orphan', age=7200)
+        recent = self.blob(b'recent')
+        referenced = self.blob(b'referenced', age=7200)
+        StudentSubmission.objects.create(form_template=self.form_template, data={'Document': default_storage.url(referenced)})
+
+        self.gc()
+        self.assertFalse(default_storage.exists(orphan))
+        # Younger than --min-age: its row may not be saved yet
+        self.assertTrue(default_storage.exists(recent))
+        self.assertTrue(default_storage.exists(referenced))
+
+    def test_dry_run_deletes_nothing(self):
+        orphan = self.blob(b'orphan', age=7200)
+        self.gc(dry_run=True)
+        self.assertTrue(default_storage.exists(orphan))
+
+    def test_deduplicated_upload_revives_an_orphan(self):
+        orphan = self.blob(b'same content', age=7200)
+        # An upload with the same content reuses the stored file before its row is saved
+        self.assertEqual(self.blob(b'same content'), orphan)
+        self.gc()
+        self.assertTrue(default_storage.exists(orphan))
+
+    def test_rows_saved_during_the_scan_are_rechecked(self):
+        orphan = self.blob(b'orphan', age=7200)
+        StudentSubmission.objects.create(form_template=self.form_template, data={}, original_photo=orphan)
+        # As if the row was saved after the reference set was built
+        with mock.patch('core.management.commands.gc_media.referenced_paths', return_value=set()):
+            self.gc()
+        self.assertTrue(default_storage.exists(orphan))
+
+
+class SegmentationSessionTests(TestCase):
+    def test_forked_children_load_their_own_session(self):
+        session = get_session('u2net')
+        pid = os.fork()
+        if pid == 0:
+            # ONNX sessions aren't fork-safe: the child must not reuse the parent's
+            os._exit(0 if get_session('u2net') is not session else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertIs(get_session('u2net'), session)
+
+    def test_model_memory_is_exported(self):
+        get_session('u2net')
+        self.assertIn('segmentation_model_memory_bytes{model="u2net"}', render_prometheus())
+
+
+class RequeueTests(TestCase):
+    def setUp(self):
+        self.form_template = create_form(User.objects.create_user('admin', password='secret'), 'Form')
+
+    def submission(self, status, started_minutes_ago=None):
+        started_at = timezone.now() - timedelta(minutes=started_minutes_ago) if started_minutes_ago is not None else None
+        return StudentSubmission.objects.create(
+            form_template=self.form_template, data={}, original_photo='original_photos/x.jpg',
+            processing_status=status, processing_started_at=started_at, processing_attempts=1,
+        )
+
+    @override_settings(CELERY_BROKER_URL='', PHOTO_PROCESSING_STALE_AFTER=600)
+    def test_rows_being_processed_are_not_requeued(self):
+        done = self.submission(StudentSubmission.STATUS_DONE)
+        claimed = self.submission(StudentSubmission.STATUS_PROCESSING, started_minutes_ago=1)
+        abandoned = self.submission(StudentSubmission.STATUS_PROCESSING, started_minutes_ago=60)
+
+        self.assertEqual(requeue_submissions(self.form_template.submissions.all()), 2)
+        statuses = dict(StudentSubmission.objects.values_list('id', 'processing_status'))
+        self.assertEqual(statuses[done.id], StudentSubmission.STATUS_PENDING)
+        self.assertEqual(statuses[claimed.id], StudentSubmission.STATUS_PROCESSING)
+        self.assertEqual(statuses[abandoned.id], StudentSubmission.STATUS_PENDING)
+
+
+class RosterImportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='secret')
+        self.form_template = FormTemplate.objects.create(admin=self.admin, title='Form', form_fields=[
+            {'name': 'Roll Number', 'type': 'text', 'required': True},
+            {'name': 'Full Name', 'type': 'text', 'required': True},
+            {'name': 'Class', 'type': 'select', 'required': False, 'options': ['A', 'B']},
+        ])
+
+    def csv(self, text):
+        return SimpleUploadedFile('roster.csv', text.encode())
+
+    def found(self, query):
+        submissions = search_submissions(self.form_template, query, self.form_template.submissions.all())
+        return [data['Roll Number'] for data in submissions.values_list('data', flat=True)]
+
+    def count(self):
+        self.form_template.refresh_from_db(fields=['submission_count'])
+        return self.form_template.submission_count
+
+    def test_csv_rows_are_validated_and_indexed(self):
+        result = import_roster(self.form_template, self.csv(
+            'Roll Number,Full Name,Class\n1,Ama Owusu,A\n2,Kofi Mensah,C\n,No Roll,B\n3,Zoë Adjei,B\n'
+        ), 'roster.csv')
+
+        self.assertEqual((result.created, result.updated), (2, 0))
+        self.assertEqual([line for line, _ in result.errors], [3, 4])
+        self.assertIn('Class', result.errors[0][1])
+        self.assertEqual(self.count(), 2)
+        self.assertEqual(
+            set(self.form_template.submissions.values_list('processing_status', flat=True)), {StudentSubmission.STATUS_AWAITING_PHOTO},
+        )
+        # bulk_create sends no signals, so the import writes the search terms itself
+        self.assertEqual(self.found('zoe'), ['3'])
+
+    def test_reimport_updates_rows_and_their_search_terms(self):
+        import_roster(self.form_template, self.csv('Roll Number,Full Name\n1,Ama Owusu\n'), 'roster.csv')
+        result = import_roster(self.form_template, self.csv('Roll Number,Full Name\n1,Ama Boateng\n2,Kofi\n'), 'roster.csv')
+
+        self.assertEqual((result.created, result.updated), (1, 1))
+        self.assertEqual(self.count(), 2)
+        self.assertEqual(self.found('boateng'), ['1'])
+        self.assertEqual(self.found('owusu'), [])
+
+    def test_xlsx_cells_are_read_as_typed(self):
+        from openpyxl import Workbook
+        workbook = Workbook()
+        workbook.active.append(['Roll Number', 'Full Name', 'Class'])
+        workbook.active.append([101.0, 'Ama Owusu', 'A'])
+        workbook.active.append([None, None, None])
+        workbook.active.append([102, 'Kofi Mensah', None])
+        buffer = BytesIO()
+        workbook.save(buffer)
+        buffer.seek(0)
+
+        result = import_roster(self.form_template, buffer, 'roster.xlsx')
+        self.assertEqual((result.created, result.errors), (2, []))
+        self.assertEqual(self.found('Roll Number = 101'), ['101'])
+
+    def test_view_reports_skipped_rows(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('import_roster', args=[self.form_template.id]), {
+            'roster': self.csv('Roll Number,Full Name\n1,Ama\n2,\n'),
+        }, follow=True)
+        shown = [str(m) for m in response.context['messages']]
+        self.assertTrue(any('1 new' in m for m in shown), shown)
+        self.assertTrue(any('row 3' in m for m in shown), shown)
+
+    def test_roster_without_roll_numbers_is_refused(self):
+        with self.assertRaises(RosterError):
+            import_roster(self.form_template, self.csv('Full Name\nAma\n'), 'roster.csv')
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.form_template = FormTemplate.objects.create(
+            admin=User.objects.create_user('admin', password='secret'), title='Form', form_fields=[
+                {'name': 'Roll Number', 'type': 'text'}, {'name': 'Full Name', 'type': 'text'},
+            ],
+        )
+        for roll_number, name in (('12', 'Ama Owusu'), ('123', 'Zoë Adjei'), ('7', 'Kofi Amankwah')):
+            StudentSubmission.objects.create(form_template=self.form_template, data={'Roll Number': roll_number, 'Full Name': name})
+
+    def found(self, query):
+        submissions = search_submissions(self.form_template, query, self.form_template.submissions.all())
+        return sorted(data['Full Name'] for data in submissions.values_list('data', flat=True))
+
+    def test_parse_query(self):
+        self.assertEqual(parse_query(self.form_template, 'roll number = 12; Full Name: AMA'), [
+            ('Roll Number', '12', True), ('Full Name', 'ama', False),
+        ])
+        # Unknown fields and plain text become free-text words
+        self.assertEqual(parse_query(self.form_template, 'House: Red'), [(None, 'house', False), (None, 'red', False)])
+        self.assertEqual(parse_query(self.form_template, ' ; '), [])
+
+    def test_free_text_prefix_matches_every_word(self):
+        self.assertEqual(self.found('am'), ['Ama Owusu', 'Kofi Amankwah'])
+        self.assertEqual(self.found('am ow'), ['Ama Owusu'])
+        self.assertEqual(self.found('nobody'), [])
+
+    def test_field_filters(self):
+        self.assertEqual(self.found('Roll Number = 12'), ['Ama Owusu'])
+        # The prefix range scan includes 123 but not 7
+        self.assertEqual(self.found('Roll Number: 12'), ['Ama Owusu', 'Zoë Adjei'])
+        self.assertEqual(self.found('Full Name: kofi; Roll Number = 7'), ['Kofi Amankwah'])
+
+    def test_accents_and_case_are_folded(self):
+        self.assertEqual(normalize('  ZOË   Adjéi '), 'zoe adjei')
+        self.assertEqual(self.found('ZOE'), ['Zoë Adjei'])
+        self.assertEqual(self.found('Full Name = zoë adjei'), ['Zoë Adjei'])
+
+    def test_edited_submission_is_reindexed(self):
+        submission = self.form_template.submissions.order_by('id').last()
+        submission.data = {**submission.data, 'Full Name': 'Kwame Boateng'}
+        submission.save()
+        self.assertEqual(self.found('kofi'), [])
+        self.assertEqual(self.found('kwame'), ['Kwame Boateng'])
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        self.form_template = create_form(User.objects.create_user('admin', password='secret'), 'Form', submissions=5)
+        # Two rows share a timestamp, so the id has to break the tie
+        first, second = self.form_template.submissions.order_by('id')[:2]
+        StudentSubmission.objects.filter(id=second.id).update(submitted_at=first.submitted_at)
+
+    def test_cursor_round_trip_visits_every_row_once(self):
+        expected = list(self.form_template.submissions.order_by('-submitted_at', '-id').values_list('id', flat=True))
+        seen, cursor = [], None
+        while True:
+            page, cursor = paginate_submissions(self.form_template.submissions.all(), cursor, 2)
+            seen += [submission.id for submission in page]
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_starts_over(self):
+        first_page, _ = paginate_submissions(self.form_template.submissions.all(), None, 2)
+        for cursor in ('not-a-cursor', 'Zm9vfGJhcg==', ''):
+            page, _ = paginate_submissions(self.form_template.submissions.all(), cursor, 2)
+            self.assertEqual(page, first_page, cursor)
+
+
+class RenditionTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        admin = User.objects.create_user('admin', password='secret')
+        self.client.force_login(admin)
+        self.submission = StudentSubmission.objects.create(
+            form_template=create_form(admin, 'Form'), data={}, processed_photo=photo_upload((600, 800), 'processed.jpg'),
+        )
+
+    def get(self, rendition, **kwargs):
+        return self.client.get(reverse('submission_photo', args=[self.submission.id, rendition]), **kwargs)
+
+    def test_rendition_is_generated_once_and_revalidated_with_etag(self):
+        response = self.get('thumb')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (112, 112))
+        self.submission.refresh_from_db()
+        name = derivative_name(self.submission.processed_photo_digest, 'thumb')
+        self.assertTrue(default_storage.exists(name))
+
+        with mock.patch('core.derivatives.render') as render:
+            response = self.get('thumb', headers={'If-None-Match': response['ETag']})
+        render.assert_not_called()
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+    def test_versioned_url_is_cached_forever(self):
+        self.get('preview')
+        self.submission.refresh_from_db()
+        response = self.get('preview', data={'v': self.submission.processed_photo_digest})
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_unknown_rendition_is_404(self):
+        self.assertEqual(self.get('poster').status_code, 404)
+
+
+class FormCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.form_template = create_form(User.objects.create_user('admin', password='secret'), 'Form')
+
+    def test_saving_a_template_invalidates_its_cached_object_and_page(self):
+        slug = self.form_template.slug
+        render = mock.Mock(return_value='<p>Form</p>')
+        get_form_template(slug)
+        get_rendered_form(slug, render)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_form_template(slug).title, 'Form')
+        self.assertEqual(get_rendered_form(slug, render), '<p>Form</p>')
+        self.assertEqual(render.call_count, 1)
+
+        self.form_template.title = 'Renamed'
+        self.form_template.save()
+        self.assertEqual(get_form_template(slug).title, 'Renamed')
+        get_rendered_form(slug, render)
+        self.assertEqual(render.call_count, 2)
+
+    def test_deleted_template_is_no_longer_served(self):
+        slug = self.form_template.slug
+        get_form_template(slug)
+        self.form_template.delete()
+        with self.assertRaises(Http404):
+            get_form_template(slug)
@@ -5,6 +5,10 @@ urlpatterns = [
     # Public Form URLs
     path('form/success/', views.form_success_view, name='form_success'),
     path('form/<slug:slug>/', views.student_form_view, name='student_form'),
+    path('form/<slug:slug>/submit/', views.student_form_submit_view, name='student_form_submit'),
+    path('form/<slug:slug>/uploads/', views.upload_start_view, name='upload_start'),
+    path('form/<slug:slug>/uploads/<uuid:upload_id>/', views.upload_chunk_view, name='upload_chunk'),
+    path('form/<slug:slug>/uploads/<uuid:upload_id>/complete/', views.upload_complete_view, name='upload_complete'),
     
 
     # Admin Panel URLs
@@ -16,14 +20,25 @@ urlpatterns = [
     # Form Management
     path('admin-panel/form/create/', views.create_or_edit_form_view, name='create_form'),
     path('admin-panel/form/edit/<int:form_id>/', views.create_or_edit_form_view, name='edit_form'),
+    path('admin-panel/form/preview-background/<int:form_id>/', views.preview_background_view, name='preview_background'),
     path('admin-panel/form/duplicate/<int:form_id>/', views.duplicate_form_view, name='duplicate_form'),
     path('admin-panel/form/delete/<int:form_id>/', views.delete_form_view, name='delete_form'),
 
     # Submission Management
     path('admin-panel/form/<int:form_id>/submissions/', views.view_submissions_view, name='view_submissions'),
+    path('admin-panel/form/<int:form_id>/submissions/page/', views.submissions_page_view, name='submissions_page'),
+    path('admin-panel/form/<int:form_id>/submissions/status/', views.submission_status_view, name='submission_status'),
+    path('admin-panel/submission/<int:submission_id>/photo/<str:rendition>/', views.submission_photo_view, name='submission_photo'),
     path('admin-panel/submission/delete/<int:submission_id>/', views.delete_submission_view, name='delete_submission'),
+    path('admin-panel/form/<int:form_id>/import-roster/', views.import_roster_view, name='import_roster'),
     
     # Data Export
     path('admin-panel/form/<int:form_id>/export/csv/', views.export_csv_view, name='export_csv'),
+    path('admin-panel/form/<int:form_id>/export/xlsx/', views.export_xlsx_view, name='export_xlsx'),
     path('admin-panel/form/<int:form_id>/export/zip/', views.export_photos_zip_view, name='export_zip'),
+    path('admin-panel/form/<int:form_id>/export/cards/', views.export_cards_pdf_view, name='export_cards'),
+    path('admin-panel/card-export/<int:export_id>/', views.card_export_view, name='card_export'),
+
+    # Monitoring
+    path('metrics', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
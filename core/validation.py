@@ -0,0 +1,152 @@
+import json
+import hashlib
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+
+# Compiled validators keyed by (template id, fingerprint of form_fields), so an edited form gets a fresh one
+_compiled_validators = {}
+_MAX_COMPILED_VALIDATORS = 256
+
+
+def _text(field):
+    def clean(post, files):
+        value = post.get(field['name'])
+        return value.strip() if value is not None else None
+    return clean
+
+
+def _email(field):
+    def clean(post, files):
+        value = (post.get(field['name']) or '').strip()
+        if value:
+            try:
+                validate_email(value)
+            except ValidationError:
+                raise ValueError('Enter a valid email address.')
+        return value
+    return clean
+
+
+def _number(field):
+    def clean(post, files):
+        # Validated as a number but stored as typed, so values like roll numbers keep leading zeros
+        value = (post.get(field['name']) or '').strip()
+        if value:
+            try:
+                finite = Decimal(value).is_finite()
+            except InvalidOperation:
+                finite = False
+            # Decimal also parses 'NaN', 'inf' and '-Infinity'
+            if not finite:
+                raise ValueError('Enter a number.')
+        return value
+    return clean
+
+
+def _date(field):
+    def clean(post, files):
+        value = (post.get(field['name']) or '').strip()
+        if value:
+            try:
+                value = date.fromisoformat(value).isoformat()
+            except ValueError:
+                raise ValueError('Enter a valid date (YYYY-MM-DD).')
+        return value
+    return clean
+
+
+def _choice(field):
+    options = set(field.get('options') or [])
+
+    def clean(post, files):
+        value = post.get(field['name']) or ''
+        if value and value not in options:
+            raise ValueError('Select a valid option.')
+        return value
+    return clean
+
+
+def _multiple_choice(field):
+    options = set(field.get('options') or [])
+
+    def clean(post, files):
+        values = post.getlist(field['name'])
+        if any(value not in options for value in values):
+            raise ValueError('Select valid options.')
+        return values
+    return clean
+
+
+def _file(field):
+    def clean(post, files):
+        uploaded_file = files.get(field['name'])
+        if uploaded_file and uploaded_file.size > settings.MAX_EXTRA_UPLOAD_SIZE:
+            raise ValueError(f'File is too large (max {settings.MAX_EXTRA_UPLOAD_SIZE // (1024 * 1024)} MB).')
+        return uploaded_file
+    return clean
+
+
+FIELD_CLEANERS = {
+    'email': _email,
+    'number': _number,
+    'date': _date,
+    'select': _choice,
+    'radio': _choice,
+    'checkbox': _multiple_choice,
+    'file': _file,
+}
+
+
+class SubmissionValidator:
+    """
+    Validates a POSTed submission against a form's fields in a single pass.
+    Built once per form version by compile_validator(); validate() does no file I/O, so bad
+    submissions are rejected before anything is stored or processed.
+    """
+
+    def __init__(self, form_fields):
+        self.fields = []
+        for field in form_fields:
+            if not field.get('name'):
+                continue
+            cleaner = FIELD_CLEANERS.get(field.get('type'), _text)(field)
+            self.fields.append((field['name'], field.get('type'), bool(field.get('required')), cleaner))
+
+    def validate(self, post, files):
+        """
+        Returns (data, uploads, errors). data holds the cleaned values (None for file fields); uploads maps
+        file fields to their uploaded files (or None) for the caller to store; errors maps field names to messages.
+        """
+        data, uploads, errors = {}, {}, {}
+        for name, field_type, required, clean in self.fields:
+            try:
+                value = clean(post, files)
+            except ValueError as e:
+                errors[name] = str(e)
+                continue
+            if required and not value:
+                errors[name] = 'This field is required.'
+                continue
+            if field_type == 'file':
+                # Placeholder keeps the field order; the caller fills in the stored file's URL
+                data[name] = None
+                uploads[name] = value
+            else:
+                data[name] = value
+        return data, uploads, errors
+
+
+def compile_validator(form_template):
+    """The cached SubmissionValidator for the current version of a form's fields."""
+    fingerprint = hashlib.sha1(json.dumps(form_template.form_fields, sort_keys=True).encode()).hexdigest()
+    key = (form_template.id, fingerprint)
+    validator = _compiled_validators.get(key)
+    if validator is None:
+        if len(_compiled_validators) >= _MAX_COMPILED_VALIDATORS:
+            _compiled_validators.clear()
+        validator = _compiled_validators[key] = SubmissionValidator(form_template.form_fields)
+    return validator
@@ -1,52 +1,35 @@
-import os
-import io
-import zipfile
 import json
-import pandas as pd
-from PIL import Image
 
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse, Http404
+from django.template.loader import render_to_string
 from django.views.decorators.csrf import csrf_exempt
-from django.core.files.base import ContentFile
+from django.views.decorators.http import require_POST, require_http_methods
 from django.contrib import messages
 from django.core.files.storage import default_storage
 
-from .models import FormTemplate, StudentSubmission
+from .models import CardExport, ChunkedUpload, FormTemplate, StudentSubmission
 from .forms import AdminLoginForm
-from rembg import remove # We need rembg here now
-
-# --- Helper Function (Moved back from tasks.py) ---
-def process_photo(image_file, form_template):
-    """
-    Removes background from an image and applies a new background color or image.
-    """
-    try:
-        input_image = Image.open(image_file).convert("RGBA")
-        output_image = remove(input_image)
-
-        if form_template.background_type == 'color':
-            background = Image.new('RGBA', output_image.size, form_template.background_color)
-        else:
-            if not form_template.background_image:
-                background = Image.new('RGBA', output_image.size, '#FFFFFF') # Fallback
-            else:
-                background = Image.open(form_template.background_image).convert("RGBA")
-                background = background.resize(output_image.size)
-        
-        final_image = Image.alpha_composite(background, output_image).convert("RGB")
-        
-        buffer = io.BytesIO()
-        final_image.save(buffer, format='JPEG', quality=90)
-        buffer.seek(0)
-        
-        return ContentFile(buffer.getvalue(), name=f'processed_{os.path.basename(image_file.name)}.jpg')
-
-    except Exception as e:
-        print(f"Error processing photo: {e}")
-        return None
+from .form_cache import get_form_template, get_rendered_form
+from .exports import stream_photos_zip, stream_submissions_csv, write_submissions_xlsx
+from .blobs import HashingFileUploadHandler, store_blob
+from .cards import SHEET_SIZES_MM
+from .chunked_uploads import (
+    UploadError, append_chunk, close_uploads, complete_upload, completed_uploads, open_uploads, start_upload, upload_state,
+)
+from .derivatives import RENDITIONS, derivative_url, ensure_derivative
+from .image_processing import PhotoRejected, apply_background, inspect_photo
+from .metrics import render_prometheus, timed_stream, timer
+from .pagination import paginate_submissions
+from .roster import ROLL_NUMBER_FIELD, RosterError, find_roster_submission, import_roster
+from .search import search_submissions
+from .tasks import enqueue_photo_processing, load_cutout, start_card_export
+from .validation import compile_validator
 
 # --- Admin Panel Views ---
 
@@ -76,8 +59,9 @@ def admin_logout_view(request):
 @login_required
 def dashboard_view(request):
     forms = FormTemplate.objects.filter(admin=request.user).order_by('-created_at')
-    total_forms = forms.count()
-    total_submissions = StudentSubmission.objects.filter(form_template__in=forms).count()
+    totals = forms.aggregate(total_forms=Count('id'), total_submissions=Sum('submission_count'))
+    total_forms = totals['total_forms']
+    total_submissions = totals['total_submissions'] or 0
     context = {'forms': forms, 'total_forms': total_forms, 'total_submissions': total_submissions}
     return render(request, 'admin_panel/dashboard.html', context)
 
@@ -105,7 +89,7 @@ def create_or_edit_form_view(request, form_id=None):
                 instance.background_color = background_color
                 instance.background_image = None
             elif background_image:
-                instance.background_image = background_image
+                instance.background_image = store_blob(background_image, 'backgrounds')[0]
             if client_logo:
                 instance.client_logo = client_logo
             instance.save()
@@ -116,7 +100,7 @@ def create_or_edit_form_view(request, form_id=None):
                 background_type=background_type, background_color=background_color,
             )
             if background_image:
-                new_form.background_image = background_image
+                new_form.background_image = store_blob(background_image, 'backgrounds')[0]
             if client_logo:
                 new_form.client_logo = client_logo
             new_form.save()
@@ -126,6 +110,28 @@ def create_or_edit_form_view(request, form_id=None):
 
     return render(request, 'admin_panel/form_detail.html', {'form': instance})
 
+@login_required
+def preview_background_view(request, form_id):
+    """Renders the latest student's stored cut-out on a candidate background color, without re-running segmentation."""
+    form_template = get_object_or_404(FormTemplate, id=form_id, admin=request.user)
+    submission = form_template.submissions.exclude(cutout_photo='').exclude(cutout_photo__isnull=True).order_by('-submitted_at').first()
+    cutout = load_cutout(submission) if submission else None
+    if cutout is None:
+        return HttpResponse(status=404)
+
+    color = request.GET.get('color')
+    if color:
+        form_template.background_type = 'color'
+        form_template.background_color = color
+    try:
+        preview = apply_background(cutout, form_template)
+    except ValueError:
+        return HttpResponse('Invalid color.', status=400)
+
+    response = HttpResponse(content_type='image/jpeg')
+    preview.save(response, format='JPEG', quality=85)
+    return response
+
 @login_required
 def duplicate_form_view(request, form_id):
     original_form = get_object_or_404(FormTemplate, id=form_id, admin=request.user)
@@ -149,12 +155,70 @@ def delete_form_view(request, form_id):
 @login_required
 def view_submissions_view(request, form_id):
     form_template = get_object_or_404(FormTemplate, id=form_id, admin=request.user)
-    submissions = form_template.submissions.all().order_by('-submitted_at')
+    submissions, next_cursor, query = _submissions_page(request, form_template)
+    context = {'form': form_template, 'submissions': submissions, 'next_cursor': next_cursor, 'query': query}
+    return render(request, 'admin_panel/form_submissions.html', context)
+
+@login_required
+def submissions_page_view(request, form_id):
+    """Next page of submission rows for infinite scroll on the submissions page."""
+    form_template = get_object_or_404(FormTemplate, id=form_id, admin=request.user)
+    submissions, next_cursor, query = _submissions_page(request, form_template)
+    html = render_to_string('admin_panel/_submission_rows.html', {'form': form_template, 'submissions': submissions}, request=request)
+    return JsonResponse({'html': html, 'next_cursor': next_cursor})
+
+def _submissions_page(request, form_template):
+    submissions = form_template.submissions.all()
     query = request.GET.get('q', '')
     if query:
-        submissions = [s for s in submissions if query.lower() in str(s.data).lower()]
-    context = {'form': form_template, 'submissions': submissions, 'query': query}
-    return render(request, 'admin_panel/form_submissions.html', context)
+        submissions = search_submissions(form_template, query, submissions)
+    page, next_cursor = paginate_submissions(submissions, request.GET.get('cursor'), settings.SUBMISSIONS_PAGE_SIZE)
+    return page, next_cursor, query
+
+@login_required
+def submission_photo_view(request, submission_id, rendition):
+    """
+    Serves a named rendition of a processed photo (see core.derivatives.RENDITIONS), generating it on first request.
+    URLs carry the photo's digest as ?v=, so a matching request can be cached forever.
+    """
+    if rendition not in RENDITIONS:
+        raise Http404
+    submission = get_object_or_404(StudentSubmission, id=submission_id, form_template__admin=request.user)
+    if not submission.processed_photo:
+        raise Http404
+
+    try:
+        name = ensure_derivative(submission, rendition)
+    except OSError:
+        raise Http404
+    etag = f'"{submission.processed_photo_digest}-{rendition}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponse(status=304)
+    else:
+        response = FileResponse(default_storage.open(name, 'rb'), content_type=RENDITIONS[rendition]['content_type'])
+    response['ETag'] = etag
+    if request.GET.get('v') == submission.processed_photo_digest:
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@login_required
+def submission_status_view(request, form_id):
+    """Returns the processing status of the requested submissions so the submissions page can poll it."""
+    form_template = get_object_or_404(FormTemplate, id=form_id, admin=request.user)
+    ids = [int(i) for i in request.GET.get('ids', '').split(',') if i.isdigit()]
+    submissions = form_template.submissions.filter(id__in=ids).only('id', 'processing_status', 'processed_photo', 'processed_photo_digest')
+    statuses = [
+        {
+            'id': s.id,
+            'status': s.processing_status,
+            'photo_url': s.processed_photo.url if s.processed_photo else None,
+            'thumbnail_url': derivative_url(s, 'thumb') if s.processed_photo else None,
+        }
+        for s in submissions
+    ]
+    return JsonResponse({'submissions': statuses})
 
 @login_required
 def delete_submission_view(request, submission_id):
@@ -165,62 +229,161 @@ def delete_submission_view(request, submission_id):
         messages.success(request, 'Submission deleted successfully.')
     return redirect('view_submissions', form_id=form_id)
 
+@login_required
+def import_roster_view(request, form_id):
+    form_template = get_object_or_404(FormTemplate, id=form_id, admin=request.user)
+    roster = request.FILES.get('roster')
+    if request.method != 'POST' or not roster:
+        messages.error(request, 'Choose a CSV or Excel roster to import.')
+        return redirect('view_submissions', form_id=form_id)
+    try:
+        result = import_roster(form_template, roster, roster.name)
+    except RosterError as e:
+        messages.error(request, str(e))
+        return redirect('view_submissions', form_id=form_id)
+
+    messages.success(request, f'Roster imported: {result.created} new and {result.updated} updated student(s) '
+                              f'in {result.seconds:.1f}s ({result.rows_per_second:.0f} rows/sec).')
+    if result.errors:
+        shown = '; '.join(f'row {line}: {error}' for line, error in result.errors[:10])
+        more = f' (and {len(result.errors) - 10} more)' if len(result.errors) > 10 else ''
+        messages.error(request, f'{len(result.errors)} row(s) skipped: {shown}{more}')
+    return redirect('view_submissions', form_id=form_id)
+
 # --- Public Form Views ---
 
+def _read_submission(request):
+    """Parses a public form POST; uploads are streamed to temporary files and hashed on the way."""
+    request.upload_handlers = [HashingFileUploadHandler(request)]
+    with timer('submission_stage_seconds', stage='upload_parsing'):
+        return request.POST, request.FILES
+
+
+def _parse_submission(form_template, post, files):
+    """
+    Validates a public form POST. files holds the posted files plus completed chunked uploads (see open_uploads).
+    Returns (photo, form data, extra uploads, error response), the response being None when the POST is valid.
+    """
+    cropped_photo = files.get('photo')
+    if not cropped_photo:
+        return None, None, None, JsonResponse({'status': 'error', 'message': 'Main profile photo is required.'}, status=400)
+
+    # Validate everything before any file is written or the photo is queued for processing
+    with timer('submission_stage_seconds', stage='validation'):
+        form_data, uploads, errors = compile_validator(form_template).validate(post, files)
+        try:
+            inspect_photo(cropped_photo)
+        except PhotoRejected as e:
+            errors['photo'] = str(e)
+    if errors:
+        message = ' '.join(f'{name}: {error}' for name, error in errors.items())
+        return None, None, None, JsonResponse({'status': 'error', 'message': message, 'errors': errors}, status=400)
+    return cropped_photo, form_data, uploads, None
+
+
+def _submission_for(form_template, form_data):
+    """The roster record awaiting this student's photo, or a new submission."""
+    submission = find_roster_submission(form_template, form_data.get(ROLL_NUMBER_FIELD))
+    return submission or StudentSubmission(form_template=form_template, data={})
+
+
+def _store_submission_files(submission, cropped_photo, form_data, uploads):
+    """Stores the photo and extra uploads and points the (unsaved) submission at them."""
+    with timer('submission_stage_seconds', stage='extra_uploads'):
+        for field_name, uploaded_file in uploads.items():
+            if uploaded_file:
+                file_name, _ = store_blob(uploaded_file, 'extra_uploads')
+                form_data[field_name] = default_storage.url(file_name)
+
+    # Identical photos are stored once; the hash also lets the workers reuse an earlier result
+    with timer('submission_stage_seconds', stage='photo_storage'):
+        photo_name, photo_sha256 = store_blob(cropped_photo, 'original_photos')
+
+    # Values the student left empty keep what a roster import filled in
+    submission.data.update({k: v for k, v in form_data.items() if v not in (None, '', []) or k not in submission.data})
+    submission.original_photo = photo_name
+    submission.original_sha256 = photo_sha256
+    submission.processing_status = StudentSubmission.STATUS_PENDING
+    return submission
+
+
 @csrf_exempt
 def student_form_view(request, slug):
-    form_template = get_object_or_404(FormTemplate, slug=slug)
+    form_template = get_form_template(slug)
 
     if request.method == 'POST':
         try:
-            cropped_photo = request.FILES.get('photo')
-            if not cropped_photo:
-                return JsonResponse({'status': 'error', 'message': 'Main profile photo is required.'}, status=400)
-
-            form_data = {}
-            for field in form_template.form_fields:
-                field_name = field.get('name')
-                field_type = field.get('type')
-                
-                if field_type == 'checkbox':
-                    form_data[field_name] = request.POST.getlist(field_name)
-                elif field_type == 'file':
-                    uploaded_file = request.FILES.get(field_name)
-                    if uploaded_file:
-                        file_name = default_storage.save(f"extra_uploads/{uploaded_file.name}", uploaded_file)
-                        file_url = default_storage.url(file_name)
-                        form_data[field_name] = file_url
-                    else:
-                        form_data[field_name] = None
-                else:
-                    form_data[field_name] = request.POST.get(field_name)
-
-            submission = StudentSubmission(
-                form_template=form_template, 
-                data=form_data, 
-                original_photo=cropped_photo
-            )
-            submission.save()
-            
-            # --- SYNCHRONOUS PROCESSING (Back to original way) ---
-            # Run the slow photo processing *before* responding
-            processed_photo_file = process_photo(submission.original_photo, form_template)
-            if processed_photo_file:
-                submission.processed_photo.save(processed_photo_file.name, processed_photo_file)
-                submission.save(update_fields=['processed_photo'])
-            # ---
-
-            # Now return success, the user has been waiting
+            post, files = _read_submission(request)
+            completed = completed_uploads(form_template, post, files)
+            files = open_uploads(files, completed)
+            try:
+                cropped_photo, form_data, uploads, error = _parse_submission(form_template, post, files)
+                if error:
+                    return error
+
+                submission = _store_submission_files(_submission_for(form_template, form_data), cropped_photo, form_data, uploads)
+            finally:
+                close_uploads(files, completed)
+            with timer('submission_stage_seconds', stage='db_insert'):
+                submission.save()
+
+            # Background removal is slow, so it runs on the photo workers after we respond
+            enqueue_photo_processing(submission)
+
             return JsonResponse({'status': 'success', 'redirect_url': '/form/success/'})
         
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
-    return render(request, 'public_form/student_form.html', {'form': form_template})
+    html = get_rendered_form(slug, lambda: render_to_string('public_form/student_form.html', {'form': form_template}, request=request))
+    return HttpResponse(html)
+
+@csrf_exempt
+@require_POST
+async def student_form_submit_view(request, slug):
+    """
+    Async counterpart of the student_form POST, used by the public form.
+    Under ASGI the body of a slow upload is received without tying up a thread; parsing, hashing and the
+    image checks run in worker threads and the row is written with the async ORM.
+    """
+    form_template = await sync_to_async(get_form_template)(slug)
+    try:
+        post, files = await sync_to_async(_read_submission, thread_sensitive=False)(request)
+        # Queries stay on the thread whose connections Django manages; only file work runs on free threads
+        completed = await sync_to_async(completed_uploads)(form_template, post, files)
+        files = await sync_to_async(open_uploads, thread_sensitive=False)(files, completed)
+        try:
+            cropped_photo, form_data, uploads, error = await sync_to_async(_parse_submission, thread_sensitive=False)(form_template, post, files)
+            if error:
+                return error
+
+            submission = await sync_to_async(_submission_for)(form_template, form_data)
+            submission = await sync_to_async(_store_submission_files, thread_sensitive=False)(submission, cropped_photo, form_data, uploads)
+        finally:
+            close_uploads(files, completed)
+        with timer('submission_stage_seconds', stage='db_insert'):
+            await submission.asave()
+
+        await sync_to_async(enqueue_photo_processing)(submission)
+
+        return JsonResponse({'status': 'success', 'redirect_url': '/form/success/'})
+
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 def form_success_view(request):
     return render(request, 'public_form/success.html')
 
+# --- Monitoring ---
+
+def metrics_view(request):
+    """Prometheus scrape endpoint for this process's metrics; guarded by METRICS_TOKEN when one is set."""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if settings.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+        return HttpResponse(status=401)
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4')
+
 # --- Data Export Views ---
 
 @login_required
@@ -230,23 +393,30 @@ def export_csv_view(request, form_id):
     if not submissions.exists():
         messages.error(request, "No submissions to export.")
         return redirect('view_submissions', form_id=form_id)
-    
-    data_list = []
-    for s in submissions:
-        flat_data = {}
-        for key, value in s.data.items():
-            if isinstance(value, list):
-                flat_data[key] = ", ".join(value)
-            else:
-                flat_data[key] = value
-        data_list.append(flat_data)
-        
-    df = pd.DataFrame(data_list)
-    response = HttpResponse(content_type='text/csv')
+
+    submissions = submissions.order_by('id')
+    rows = timed_stream(stream_submissions_csv(form_template, submissions), 'export_seconds', format='csv')
+    response = StreamingHttpResponse(rows, content_type='text/csv')
     response['Content-Disposition'] = f'attachment; filename="{form_template.slug}_submissions.csv"'
-    df.to_csv(path_or_buf=response, index=False)
     return response
 
+@login_required
+def export_xlsx_view(request, form_id):
+    form_template = get_object_or_404(FormTemplate, id=form_id, admin=request.user)
+    submissions = form_template.submissions.all()
+    if not submissions.exists():
+        messages.error(request, "No submissions to export.")
+        return redirect('view_submissions', form_id=form_id)
+
+    with timer('export_seconds', format='xlsx'):
+        output = write_submissions_xlsx(form_template, submissions.order_by('id'))
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f"{form_template.slug}_submissions.xlsx",
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
 @login_required
 def export_photos_zip_view(request, form_id):
     form_template = get_object_or_404(FormTemplate, id=form_id, admin=request.user)
@@ -254,17 +424,78 @@ def export_photos_zip_view(request, form_id):
     if not submissions.exists():
         messages.error(request, "No processed photos to export.")
         return redirect('view_submissions', form_id=form_id)
-    buffer = io.BytesIO()
-    with zipfile.ZipFile(buffer, 'w') as zip_file:
-        for submission in submissions:
-            try:
-                name = submission.data.get('Full Name', 'student').replace(' ', '_')
-                roll_no = submission.data.get('Roll Number', submission.id)
-                filename = f"{roll_no}-{name}.jpg"
-                zip_file.write(submission.processed_photo.path, arcname=filename)
-            except Exception as e:
-                print(f"Could not add file to zip: {submission.processed_photo.path}. Error: {e}")
-    buffer.seek(0)
-    response = HttpResponse(buffer, content_type='application/zip')
+    submissions = submissions.only('id', 'data', 'processed_photo').order_by('id').iterator(chunk_size=500)
+    archive = timed_stream(stream_photos_zip(submissions), 'export_seconds', format='zip')
+    response = StreamingHttpResponse(archive, content_type='application/zip')
     response['Content-Disposition'] = f'attachment; filename="{form_template.slug}_photos.zip"'
     return response
+
+@login_required
+def export_cards_pdf_view(request, form_id):
+    form_template = get_object_or_404(FormTemplate, id=form_id, admin=request.user)
+    sheet = request.GET.get('sheet', 'A4')
+    if sheet not in SHEET_SIZES_MM:
+        raise Http404("Unknown sheet size.")
+    if not form_template.submissions.exists():
+        messages.error(request, "No submissions to print.")
+        return redirect('view_submissions', form_id=form_id)
+    # Thousands of cards take longer than a request may, so the photo workers render the PDF while the admin waits
+    export = start_card_export(form_template, sheet)
+    return redirect('card_export', export_id=export.id)
+
+@login_required
+def card_export_view(request, export_id):
+    export = get_object_or_404(CardExport.objects.select_related('form_template'), id=export_id, form_template__admin=request.user)
+    if export.status == CardExport.STATUS_DONE:
+        return FileResponse(export.file.open('rb'), as_attachment=True, filename=f'{export.form_template.slug}_cards_{export.sheet}.pdf')
+    if export.status == CardExport.STATUS_FAILED:
+        messages.error(request, export.error)
+        return redirect('view_submissions', form_id=export.form_template_id)
+    return render(request, 'admin_panel/card_export.html', {'export': export, 'form': export.form_template})
+
+# --- Chunked Upload API ---
+# Attachments are sent ahead of the form in resumable chunks; the submission then references them by upload id.
+
+def _upload_error(e):
+    return JsonResponse({'status': 'error', 'message': str(e)}, status=e.status)
+
+@csrf_exempt
+@require_POST
+def upload_start_view(request, slug):
+    form_template = get_form_template(slug)
+    try:
+        payload = json.loads(request.body)
+        upload = start_upload(form_template, payload['field'], payload['filename'], int(payload['size']), payload.get('sha256') or '')
+    except UploadError as e:
+        return _upload_error(e)
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'status': 'error', 'message': 'Invalid upload request.'}, status=400)
+    return JsonResponse(upload_state(upload), status=201)
+
+@csrf_exempt
+@require_http_methods(['GET', 'PUT'])
+def upload_chunk_view(request, slug, upload_id):
+    """GET reports how much has arrived (to resume from); PUT appends the request body at ?offset=."""
+    upload = get_object_or_404(ChunkedUpload, upload_id=upload_id, form_template=get_form_template(slug))
+    if request.method == 'PUT':
+        try:
+            offset = int(request.GET.get('offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+            append_chunk(upload, offset, request, length, request.headers.get('X-Chunk-SHA256', ''))
+        except UploadError as e:
+            response = _upload_error(e)
+            response['Upload-Offset'] = upload.offset
+            return response
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Invalid offset.'}, status=400)
+    return JsonResponse(upload_state(upload))
+
+@csrf_exempt
+@require_POST
+def upload_complete_view(request, slug, upload_id):
+    upload = get_object_or_404(ChunkedUpload, upload_id=upload_id, form_template=get_form_template(slug))
+    try:
+        complete_upload(upload)
+    except UploadError as e:
+        return _upload_error(e)
+    return JsonResponse(upload_state(upload))
@@ -32,6 +32,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -62,17 +63,52 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'id_card_generator.wsgi.application'
+# Serving through ASGI lets the async submit view wait on slow uploads without holding a worker thread:
+# gunicorn id_card_generator.asgi:application -k uvicorn.workers.UvicornWorker
+ASGI_APPLICATION = 'id_card_generator.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default, tuned for concurrent submissions (WAL, busy timeout; see core.signals.tune_sqlite).
+# Set DB_ENGINE=postgres and the POSTGRES_* variables for production.
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'id_card_generator'),
+            'USER': os.getenv('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            # Keep connections open between requests instead of reconnecting each time
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            # Seconds a write waits for the lock before failing with "database is locked"
+            'OPTIONS': {'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '20'))},
+        }
+    }
+
+
+# Cache
+# Local memory by default; set REDIS_URL to share the cache (and its invalidations) across processes.
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Seconds a public form definition and its rendered page stay cached (see core.form_cache)
+FORM_CACHE_TIMEOUT = int(os.getenv('FORM_CACHE_TIMEOUT', '60'))
 
 
 # Password validation
@@ -102,6 +138,17 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'core/static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    # collectstatic writes content-hashed names plus gzip and brotli copies; WhiteNoise serves the hashed files with
+    # far-future immutable cache headers, so a changed file gets a new URL instead of a stale cached copy.
+    # With DEBUG off, pages fail until collectstatic has written the manifest; `manage.py check` warns (core.W001).
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
+
+# Compressed bytes the public form may load on first visit (HTML plus its static assets); see check_asset_budget
+PUBLIC_FORM_BYTE_BUDGET = int(os.getenv('PUBLIC_FORM_BYTE_BUDGET', '40960'))
+
 # Media files (User uploaded content)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -111,4 +158,58 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-LOGIN_URL = 'admin_login'
\ No newline at end of file
+LOGIN_URL = 'admin_login'
+
+# Largest file accepted for a form's extra file fields
+MAX_EXTRA_UPLOAD_SIZE = int(os.getenv('MAX_EXTRA_UPLOAD_SIZE', str(10 * 1024 * 1024)))
+
+# Resumable uploads (core.chunked_uploads): chunk size suggested to browsers, and how long an upload may sit
+# unfinished or unused before `manage.py gc_media` discards it
+CHUNKED_UPLOAD_CHUNK_SIZE = 256 * 1024
+CHUNKED_UPLOAD_EXPIRY = int(os.getenv('CHUNKED_UPLOAD_EXPIRY', str(24 * 60 * 60))) # seconds
+
+# Rows per page on the submissions page (further pages load as the admin scrolls)
+SUBMISSIONS_PAGE_SIZE = 50
+
+# Metrics (core.metrics): Prometheus endpoint at /metrics and optional JSON log line per timed stage.
+# Metrics are kept per process; with several gunicorn workers each scrape sees the worker that answered.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False').lower() in ('true', '1', 't')
+METRICS_LOG = os.getenv('METRICS_LOG', 'False').lower() in ('true', '1', 't')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Photo processing queue
+# With a broker URL, submissions are processed by Celery workers (`celery -A id_card_generator worker`).
+# Without one, they are queued in the database and processed by `manage.py run_photo_worker`.
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', '')
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Background removal model (see rembg for available names, e.g. u2net, u2netp, isnet-general-use)
+REMBG_MODEL = os.getenv('REMBG_MODEL', 'u2net')
+REMBG_PRELOAD = os.getenv('REMBG_PRELOAD', 'False').lower() in ('true', '1', 't')
+REMBG_PRELOAD_MODELS = [m.strip() for m in os.getenv('REMBG_PRELOAD_MODELS', REMBG_MODEL).split(',') if m.strip()]
+
+# Memory budget for decoded background images kept per process (see core.image_processing.BackgroundCache)
+BACKGROUND_CACHE_MAX_BYTES = int(os.getenv('BACKGROUND_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+# Photo renditions (core.derivatives.RENDITIONS) generated as soon as a photo is processed; others are made on first request
+DERIVATIVES_PREGENERATE = ['thumb']
+
+# ID card rendering (core.cards): TrueType font for card text; DejaVu Sans or Pillow's built-in font otherwise
+CARD_FONT_PATH = os.getenv('CARD_FONT_PATH', '')
+# Card PDFs are rendered by `run_photo_worker` or Celery, across this many processes. Celery's prefork children
+# can't start processes, so under Celery each export renders in one process; run_photo_worker uses the full pool.
+CARD_RENDER_WORKERS = int(os.getenv('CARD_RENDER_WORKERS', str(os.cpu_count() or 1)))
+CARD_EXPORT_STALE_AFTER = int(os.getenv('CARD_EXPORT_STALE_AFTER', '3600')) # seconds
+
+# Uploaded photo limits and working sizes (pixels). Larger photos are reduced while decoding to
+# PHOTO_MAX_OUTPUT_SIDE, about twice what the card's 35x45 mm photo needs at 300 dpi (531 px),
+# and segmentation runs on a copy no larger than SEGMENTATION_INPUT_SIZE.
+PHOTO_MAX_PIXELS = int(os.getenv('PHOTO_MAX_PIXELS', str(40_000_000)))
+PHOTO_MIN_SIDE = 64
+PHOTO_MAX_OUTPUT_SIDE = int(os.getenv('PHOTO_MAX_OUTPUT_SIDE', '1024'))
+SEGMENTATION_INPUT_SIZE = int(os.getenv('SEGMENTATION_INPUT_SIZE', '640'))
+
+PHOTO_PROCESSING_MAX_ATTEMPTS = int(os.getenv('PHOTO_PROCESSING_MAX_ATTEMPTS', '3'))
+PHOTO_PROCESSING_RETRY_DELAY = int(os.getenv('PHOTO_PROCESSING_RETRY_DELAY', '10')) # seconds, doubled after each failed attempt
+PHOTO_PROCESSING_STALE_AFTER = int(os.getenv('PHOTO_PROCESSING_STALE_AFTER', '600')) # seconds
\ No newline at end of file
@@ -1,5 +1,12 @@
 import os
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'id_card_generator.settings')
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Loaded here rather than in AppConfig.ready() so management commands and the Celery master never load the model.
+# Servers that fork workers after loading the app get a fresh session per worker (see core.segmentation).
+if settings.REMBG_PRELOAD:
+    from core.segmentation import preload
+    preload()